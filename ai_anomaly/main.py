@@ -3,6 +3,7 @@ import os
 import time
 import logging
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -30,6 +31,7 @@ DB_USER = os.environ.get("DB_USER", "logforge")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_NAME = os.environ.get("DB_NAME", "logforge_db")
 PROCESSING_INTERVAL = int(os.environ.get("PROCESSING_INTERVAL", "60"))
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "1000"))
 
 def get_db_connection():
     """Create a database connection"""
@@ -47,58 +49,81 @@ def get_db_connection():
         return None
 
 def process_new_logs():
-    """Process new logs for anomaly detection"""
+    """Claim and score a batch of unscored logs; return how many were scored.
+
+    Rows are locked with FOR UPDATE SKIP LOCKED until the transaction
+    commits, so any number of replicas, and the API's own detector, work on
+    disjoint rows. The claim query is served by the partial index
+    idx_logs_unscored. If a replica dies mid-batch its locks are released
+    and the rows are claimed again.
+    """
     conn = get_db_connection()
     if not conn:
-        return
+        return 0
 
     try:
         with conn.cursor() as cur:
-            # Get logs that haven't been processed for anomalies
+            # Claim logs that haven't been processed for anomalies
             cur.execute("""
                 SELECT id, ts, host, app, severity, msg
                 FROM logs
-                WHERE is_anomaly IS NULL
+                WHERE anomaly_score IS NULL
                 ORDER BY ts
-                LIMIT 1000
-            """)
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (BATCH_SIZE,))
             logs = cur.fetchall()
             
             if not logs:
-                return
+                conn.rollback()
+                return 0
                 
             logger.info(f"Processing {len(logs)} new logs for anomalies")
             
             # Simple placeholder anomaly detection logic
             # In a real implementation, this would use an actual anomaly detection algorithm
+            results = []
             for log in logs:
-                log_id = log[0]
+                log_id, ts = log[0], log[1]
                 # Placeholder: mark critical and error logs as anomalies
                 severity = log[4]
                 is_anomaly = severity in ('critical', 'error')
                 anomaly_score = 0.9 if is_anomaly else 0.1
-                
-                # Update the log entry with anomaly information
-                cur.execute("""
-                    UPDATE logs
-                    SET is_anomaly = %s, anomaly_score = %s
-                    WHERE id = %s
-                """, (is_anomaly, anomaly_score, log_id))
+                results.append((log_id, ts, is_anomaly, anomaly_score))
+            
+            # Update the whole batch in one statement
+            execute_values(cur, """
+                UPDATE logs
+                SET is_anomaly = v.is_anomaly, anomaly_score = v.anomaly_score
+                FROM (VALUES %s) AS v(id, ts, is_anomaly, anomaly_score)
+                WHERE logs.id = v.id::uuid AND logs.ts = v.ts
+            """, results, page_size=len(results))
             
             conn.commit()
             logger.info(f"Completed anomaly processing for {len(logs)} logs")
+            return len(logs)
     except Exception as e:
+        conn.rollback()
         logger.error(f"Error processing logs for anomalies: {e}")
+        return 0
     finally:
         conn.close()
 
 def main():
     """Main function to run the anomaly detector"""
     logger.info("Starting anomaly detector service")
+    # Not started by default (docker-compose profile "standalone-anomaly"):
+    # the API's detector also scores templates and sends new_anomaly
+    logger.warning(
+        "This service scores with a severity placeholder and sends no new_anomaly "
+        "notifications; do not run it next to the API's anomaly detector"
+    )
     
     while True:
         try:
-            process_new_logs()
+            # A full batch means there is a backlog; claim the next one right away
+            if process_new_logs() >= BATCH_SIZE:
+                continue
         except Exception as e:
             logger.error(f"Anomaly detection error: {e}")
         
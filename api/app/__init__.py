@@ -1,8 +1,11 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import asyncpg
+import uuid
 from datetime import date, datetime
 
 # Initialize FastAPI app
@@ -29,6 +32,31 @@ async def get_db_pool():
         database=os.environ.get("DB_NAME", "logforge_db"),
         min_size=1,
         max_size=10,
+        # Per-connection LRU of prepared statements, keyed by SQL text. Log
+        # filters compile to one SQL text per filter shape, so this bounds how
+        # many shapes stay planned on each connection.
+        statement_cache_size=int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "256")),
+    )
+
+# Pooled connections that concurrent read fan-outs (/logs/stats, /dashboard)
+# hold at once across all requests, so they cannot take over the pool
+FANOUT_CONNECTIONS = int(os.environ.get("DB_FANOUT_CONNECTIONS", "4"))
+_fanout_slots = asyncio.Semaphore(FANOUT_CONNECTIONS)
+
+@asynccontextmanager
+async def acquire_fanout_connection():
+    """Acquire a pooled connection for one query of a concurrent fan-out"""
+    async with _fanout_slots, db_pool.acquire() as conn:
+        yield conn
+
+async def get_db_connection():
+    """Open a standalone connection outside the pool, e.g. for LISTEN"""
+    return await asyncpg.connect(
+        host=os.environ.get("DB_HOST", "db"),
+        port=int(os.environ.get("DB_PORT", "5432")),
+        user=os.environ.get("DB_USER", "logforge"),
+        password=os.environ.get("DB_PASSWORD"),
+        database=os.environ.get("DB_NAME", "logforge_db"),
     )
 
 @app.on_event("startup")
@@ -47,4 +75,6 @@ def json_serial(obj):
     """JSON serializer for objects not serializable by default json code"""
     if isinstance(obj, (datetime, date)):
         return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
     raise TypeError("Type not serializable")
@@ -1,14 +1,22 @@
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional, Annotated
+from typing import Any, Dict, Optional, Annotated
+from collections import OrderedDict
+import logging
 import os
+import time
 from .models import TokenData
+from .services.notifications import notification_listener
 from . import app, db_pool
 
+logger = logging.getLogger("auth")
+
 # JWT Configuration
 SECRET_KEY = os.environ.get("JWT_SECRET", "development_secret_key")
 ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
@@ -18,12 +26,37 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("JWT_EXPIRATION", "60"))
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# bcrypt takes hundreds of milliseconds by design, so it runs in a small
+# dedicated pool instead of on the event loop. Requests beyond the workers
+# plus the queue bound are turned away with a 503 rather than piling up.
+HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_SIZE = int(os.environ.get("AUTH_HASH_QUEUE_SIZE", "32"))
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+_hashes_in_flight = 0
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def _run_hashing(func, *args):
+    global _hashes_in_flight
+    if _hashes_in_flight >= HASH_WORKERS + HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _hashes_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor, func, *args)
+    finally:
+        _hashes_in_flight -= 1
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
 async def get_user(username: str):
     async with db_pool.acquire() as conn:
         row = await conn.fetchrow("SELECT * FROM users WHERE username = $1", username)
@@ -31,11 +64,101 @@ async def get_user(username: str):
             return dict(row)
     return None
 
+class UserCache:
+    """Bounded TTL cache of authenticated user principals, keyed by username.
+
+    Principals are user rows without the password hash. The users table
+    notifies ``user_changed`` with the username whenever a user's identity,
+    role or password changes or the user is deleted, and that entry is
+    dropped. The TTL bounds staleness if a notification is missed while the
+    listener reconnects.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(username)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[username]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(username)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, username: str, principal: Dict[str, Any]):
+        self.entries[username] = (time.monotonic() + self.ttl, principal)
+        self.entries.move_to_end(username)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, username: str):
+        if self.entries.pop(username, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+# Create a global instance of the user cache
+user_cache = UserCache(
+    max_entries=int(os.environ.get("AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", "60")),
+)
+
+async def get_principal(username: str):
+    """Look up the user behind a token, from the cache when possible"""
+    principal = user_cache.get(username)
+    if principal is not None:
+        return principal
+    async with db_pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT id, username, role, email, created_at, last_login FROM users WHERE username = $1",
+            username,
+        )
+    if row is None:
+        return None
+    principal = dict(row)
+    user_cache.put(username, principal)
+    return principal
+
+# Function to start invalidating the user cache from user_changed notifications
+async def start_user_cache():
+    await notification_listener.subscribe("user_changed", user_cache.invalidate)
+    # A user_changed sent while the listener was disconnected is lost
+    notification_listener.subscribe_connect(user_cache.clear)
+
+# Function to stop the user cache
+async def stop_user_cache():
+    user_cache.clear()
+
 async def authenticate_user(username: str, password: str):
     user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user["password_hash"]):
+    if not await verify_password_async(password, user["password_hash"]):
         return False
     return user
 
@@ -64,7 +187,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         token_data = TokenData(username=username, role=role)
     except JWTError:
         raise credentials_exception
-    user = await get_user(username=token_data.username)
+    user = await get_principal(token_data.username)
     if user is None:
         raise credentials_exception
     return user
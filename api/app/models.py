@@ -1,6 +1,6 @@
 
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel, Field
 
 # Authentication models
@@ -37,6 +37,17 @@ class LogSearch(BaseModel):
     severity: Optional[str] = None
     message: Optional[str] = None
     use_regex: bool = False
+    # None picks token search only when the whole message is a quoted phrase
+    # or an "a OR b" expression; otherwise it is a substring search
+    full_text: Optional[bool] = None
+
+class LogSubscription(BaseModel):
+    host: Optional[str] = None
+    app: Optional[str] = None
+    severity: Optional[Union[str, List[str]]] = None
+    message: Optional[str] = None
+    use_regex: bool = False
+    anomalies_only: bool = False
 
 # Alert models
 class AlertBase(BaseModel):
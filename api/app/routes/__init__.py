@@ -4,5 +4,6 @@
 # - auth.py: Authentication endpoints
 # - logs.py: Log query and analysis endpoints
 # - alerts.py: Alert configuration endpoints
+# - dashboard.py: Composite dashboard endpoint
 # - common.py: Shared functionality
 
@@ -2,16 +2,19 @@
 from fastapi import Depends, HTTPException, status
 from typing import Annotated, List
 
-from .. import app, db_pool
+from .. import acquire_fanout_connection, app, db_pool
 from ..models import Alert, AlertCreate, AlertUpdate
 from ..auth import get_current_active_user, check_admin_role
 
-@app.get("/alerts", response_model=List[Alert])
-async def get_alerts(current_user: Annotated[dict, Depends(get_current_active_user)]):
-    async with db_pool.acquire() as conn:
+async def fetch_alerts():
+    async with acquire_fanout_connection() as conn:
         rows = await conn.fetch("SELECT * FROM alerts ORDER BY created_at DESC")
         return [dict(row) for row in rows]
 
+@app.get("/alerts", response_model=List[Alert])
+async def get_alerts(current_user: Annotated[dict, Depends(get_current_active_user)]):
+    return await fetch_alerts()
+
 @app.post("/alerts", response_model=Alert, status_code=status.HTTP_201_CREATED)
 async def create_alert(
     alert: AlertCreate, 
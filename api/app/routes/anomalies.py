@@ -6,12 +6,26 @@ import json
 import asyncio
 
 from ..models import LogBase
+from ..serialization import FastJSONResponse, records
 from ..auth import get_current_active_user, check_admin_role
-from .. import db_pool
+from .. import acquire_fanout_connection, db_pool
 from ..routes.logs import manager
+from ..services.anomaly_detector import anomaly_detector
 
 router = APIRouter()
 
+async def fetch_recent_anomalies(limit: int) -> List[Dict[str, Any]]:
+    """Fetch the most recent anomalies on a fan-out connection"""
+    async with acquire_fanout_connection() as conn:
+        query = """
+            SELECT id, ts, host, app, severity, msg, anomaly_score
+            FROM logs
+            WHERE is_anomaly = true
+            ORDER BY ts DESC
+            LIMIT $1
+        """
+        return records(await conn.fetch(query, limit))
+
 @router.get("/anomalies/recent", response_model=List[Dict[str, Any]])
 async def get_recent_anomalies(
     limit: int = 10,
@@ -19,20 +33,15 @@ async def get_recent_anomalies(
 ):
     """Get recent anomalies from the database"""
     try:
-        async with db_pool.acquire() as conn:
-            query = """
-                SELECT id, ts, host, app, severity, msg, anomaly_score
-                FROM logs
-                WHERE is_anomaly = true
-                ORDER BY ts DESC
-                LIMIT $1
-            """
-            rows = await conn.fetch(query, limit)
-            
-            return [dict(row) for row in rows]
+        return FastJSONResponse(await fetch_recent_anomalies(limit))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching anomalies: {str(e)}")
 
+@router.get("/anomalies/detector", response_model=Dict[str, Any])
+async def get_detector_status(current_user: dict = Depends(check_admin_role)):
+    """Get the anomaly detector's watermark and how far it is behind"""
+    return FastJSONResponse(anomaly_detector.status())
+
 @router.get("/anomalies/explain/{anomaly_id}", response_model=Dict[str, Any])
 async def explain_anomaly(
     anomaly_id: str,
@@ -8,8 +8,10 @@ from .. import app, db_pool
 from ..models import Token, User
 from ..auth import (
     authenticate_user, 
+    check_admin_role,
     create_access_token, 
     get_current_active_user, 
+    user_cache,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
@@ -44,3 +46,8 @@ async def read_users_me(current_user: Annotated[dict, Depends(get_current_active
         "email": current_user["email"],
         "role": current_user["role"]
     }
+
+# User cache statistics endpoint
+@app.get("/users/cache")
+async def get_user_cache_stats(current_user: Annotated[dict, Depends(check_admin_role)]):
+    return user_cache.stats()
@@ -0,0 +1,55 @@
+from fastapi import Depends
+from typing import Any, Awaitable, Dict
+import asyncio
+import logging
+import os
+
+from .. import app
+from ..auth import get_current_active_user
+from ..serialization import FastJSONResponse
+from .logs import fetch_log_stats, fetch_log_patterns
+from .anomalies import fetch_recent_anomalies
+from .alerts import fetch_alerts
+
+logger = logging.getLogger("dashboard")
+
+# Seconds each dashboard section may take before it is reported as timed out
+DASHBOARD_SECTION_TIMEOUT = float(os.environ.get("DASHBOARD_SECTION_TIMEOUT", "5"))
+
+async def _section(name: str, coro: Awaitable, errors: Dict[str, str]) -> Any:
+    try:
+        return await asyncio.wait_for(coro, timeout=DASHBOARD_SECTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        errors[name] = f"Timed out after {DASHBOARD_SECTION_TIMEOUT:g}s"
+    except Exception as e:
+        logger.error(f"Error loading dashboard section {name}: {str(e)}")
+        errors[name] = str(e)
+    return None
+
+# Composite dashboard endpoint
+@app.get("/dashboard")
+async def get_dashboard(
+    anomaly_limit: int = 10,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Load every dashboard section in one round trip.
+    
+    Sections run concurrently, each with its own timeout. Their queries
+    share the DB_FANOUT_CONNECTIONS pooled connections, so dashboard loads
+    never hold more of the pool than that. A slow or failing section comes
+    back as null with an entry in "errors" instead of holding up the others.
+    """
+    errors: Dict[str, str] = {}
+    stats, recent_anomalies, alerts, patterns = await asyncio.gather(
+        _section("stats", fetch_log_stats(), errors),
+        _section("recent_anomalies", fetch_recent_anomalies(anomaly_limit), errors),
+        _section("alerts", fetch_alerts(), errors),
+        _section("patterns", fetch_log_patterns(), errors),
+    )
+    return FastJSONResponse({
+        "stats": stats,
+        "recent_anomalies": recent_anomalies,
+        "alerts": alerts,
+        "patterns": patterns,
+        "errors": errors,
+    })
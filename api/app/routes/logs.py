@@ -1,385 +1,903 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from asyncpg.exceptions import PostgresError
+from pydantic import ValidationError
+import pyarrow as pa
+import pyarrow.parquet as pq
+import orjson
 import asyncio
+import base64
+import binascii
+import csv
+import functools
+import io
 import json
+import logging
+import os
+import uuid
+import zlib
+from collections import defaultdict
 from typing import List, Dict, Optional, Any
-from datetime import datetime, timedelta
-from .. import app, db_pool
-from ..models import LogBase, LogSearch
+from datetime import datetime, timedelta, timezone
+from .. import acquire_fanout_connection, app, db_pool, serialization
+from ..models import LogBase, LogSearch, LogSubscription
+from ..serialization import FastJSONResponse
 from ..auth import get_current_active_user, check_admin_role
+from ..services.log_query import (
+    HISTOGRAM_GROUPS,
+    LOG_COLUMNS,
+    build_export_query,
+    build_histogram_query,
+    build_search_query,
+    choose_bucket_width,
+    normalize_search,
+)
+from ..services.broadcast import (
+    BATCH_SIZE,
+    FLUSH_INTERVAL,
+    Event,
+    ReplayBuffer,
+    WebSocketClient,
+    encode_frames,
+    next_sequence,
+    sequence_time,
+)
+from ..services.anomaly_detector import NOTIFY_MSG_CHARS
+from ..services.live_tail import LiveTail, TailFilter, compile_subscription
+from ..services.notifications import notification_listener
+from ..services.search_cache import search_cache
+from ..services.row_estimates import (
+    COUNT_MODES,
+    approximate_anomaly_count,
+    approximate_total,
+    count_logs,
+)
+from ..services.live_stats import WINDOWS, live_stats
+
+logger = logging.getLogger("logs")
+
+# PostgreSQL notification channels and the WebSocket client types they reach.
+# new_anomaly also feeds anomaly-only /ws/logs filters.
+CHANNEL_CLIENT_TYPES = {
+    "new_log": ("logs",),
+    "new_anomaly": ("anomalies", "logs"),
+    "new_alert": ("alerts",),
+}
+
+# The channel whose sequence numbers each client type resumes from
+CHANNEL_TYPES = {"logs": "new_log", "anomalies": "new_anomaly", "alerts": "new_alert"}
+
+# Most missed events a resuming client is sent from the database
+REPLAY_DB_LIMIT = int(os.environ.get("WS_REPLAY_DB_LIMIT", "5000"))
+
+# Seconds the database fallback of a resume reaches back before the gap.
+# Events are written before their notification is received, so the emit
+# time of the first missed event can be slightly older than its sequence.
+REPLAY_SLACK = timedelta(seconds=float(os.environ.get("WS_REPLAY_SLACK", "1")))
+
+# Queries for events older than a channel's replay buffer, newest first.
+# They select by the column stamped when the notification was sent, and
+# rows have the same shape as the channel's notification payloads.
+REPLAY_QUERIES = {
+    "new_log": f"""
+        SELECT {", ".join(LOG_COLUMNS)}
+        FROM logs
+        WHERE ingested_at > $1 AND ingested_at <= $2
+        ORDER BY ingested_at DESC
+        LIMIT $3
+    """,
+    # Anomaly notifications carry a truncated message and no is_anomaly flag
+    "new_anomaly": f"""
+        SELECT id, ts, host, app, severity, left(msg, {NOTIFY_MSG_CHARS}) AS msg, anomaly_score
+        FROM logs
+        WHERE scored_at > $1 AND scored_at <= $2 AND is_anomaly
+        ORDER BY scored_at DESC
+        LIMIT $3
+    """,
+    # triggered_at is formatted like the ingest service's JavaScript Date
+    "new_alert": """
+        SELECT
+            h.alert_id,
+            a.name AS alert_name,
+            a.severity,
+            l.log_id,
+            to_char(h.triggered_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"') AS triggered_at
+        FROM alert_history h
+        JOIN alerts a ON a.id = h.alert_id
+        CROSS JOIN unnest(h.log_ids) AS l(log_id)
+        WHERE h.triggered_at > $1 AND h.triggered_at <= $2
+        ORDER BY h.triggered_at DESC
+        LIMIT $3
+    """,
+}
 
 # WebSocket connection manager
 class ConnectionManager:
+    """Batches hub notifications and queues them to each WebSocket client.
+
+    Every notification gets a sequence number and is kept in its channel's
+    replay buffer. Notifications are coalesced for ``FLUSH_INTERVAL``
+    seconds, or until ``BATCH_SIZE`` are pending, then sent as sequenced
+    frames. Clients without a filter share one encoded frame per batch;
+    /ws/logs clients with a filter get a frame of just their matches.
+    """
+
     def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {
-            "logs": [],
-            "anomalies": [],
-            "alerts": []
+        self.active_connections: Dict[str, Dict[WebSocket, WebSocketClient]] = {
+            "logs": {},
+            "anomalies": {},
+            "alerts": {}
         }
+        # Per-client filters for /ws/logs
+        self.tail = LiveTail()
+        self.replay = {channel: ReplayBuffer() for channel in CHANNEL_CLIENT_TYPES}
+        # Sequence of the last event each channel handed to clients
+        self.flushed: Dict[str, int] = {channel: buffer.evicted for channel, buffer in self.replay.items()}
+        self.pending: Dict[str, List[Event]] = defaultdict(list)
+        self.pending_count = 0
+        self._flush_now: Optional[asyncio.Event] = None
+        self._flush_task = None
     
-    async def connect(self, websocket: WebSocket, client_type: str):
+    async def connect(
+        self, websocket: WebSocket, client_type: str, tail_filter: Optional[TailFilter] = None, start: bool = True
+    ) -> WebSocketClient:
         await websocket.accept()
-        self.active_connections[client_type].append(websocket)
+        client = WebSocketClient(websocket, functools.partial(self._on_client_closed, client_type))
+        self.active_connections[client_type][websocket] = client
+        if start:
+            client.start()
+        if client_type == "logs":
+            # Until a client sends a filter it receives every log
+            self.tail.subscribe(client, tail_filter or TailFilter())
+        return client
     
     def disconnect(self, websocket: WebSocket, client_type: str):
-        self.active_connections[client_type].remove(websocket)
+        client = self.active_connections[client_type].pop(websocket, None)
+        if client is not None:
+            self.tail.unsubscribe(client)
+            client.stop()
+    
+    def _on_client_closed(self, client_type: str, client: WebSocketClient):
+        # Prune clients whose socket failed, timed out or was closed for lagging
+        self.disconnect(client.websocket, client_type)
+    
+    def publish(self, channel: str, message: str):
+        """Notification hub callback: sequence a payload and buffer it until the next flush"""
+        seq = next_sequence()
+        self.replay[channel].append(seq, message)
+        self.pending[channel].append((seq, message))
+        self.pending_count += 1
+        if self.pending_count >= BATCH_SIZE and self._flush_now is not None:
+            self._flush_now.set()
+    
+    def on_listener_connected(self):
+        """Notification hub reconnect: events sent while it was down never reached the buffers"""
+        for buffer in self.replay.values():
+            buffer.reset()
+    
+    def flush(self):
+        batches, self.pending = self.pending, defaultdict(list)
+        self.pending_count = 0
+        for channel, events in batches.items():
+            self.flushed[channel] = events[-1][0]
+        
+        logs = batches.get("new_log")
+        if logs:
+            self._deliver(logs, self.tail.logs)
+        anomalies = batches.get("new_anomaly")
+        if anomalies:
+            self._send_shared(self.active_connections["anomalies"].values(), anomalies)
+            self._deliver(anomalies, self.tail.anomalies)
+        alerts = batches.get("new_alert")
+        if alerts:
+            self._send_shared(self.active_connections["alerts"].values(), alerts)
+    
+    def _deliver(self, events: List[Event], index):
+        self._send_shared(list(index.unfiltered), events)
+        if index.buckets:
+            matches: Dict[WebSocketClient, List[Event]] = defaultdict(list)
+            for event in events:
+                for client in index.match(event[1]):
+                    matches[client].append(event)
+            for client, matched in matches.items():
+                for frame, count in encode_frames(matched):
+                    client.enqueue(frame, count)
+    
+    def _send_shared(self, clients, events: List[Event]):
+        clients = list(clients)
+        if not clients:
+            return
+        for frame, count in encode_frames(events):
+            for client in clients:
+                client.enqueue(frame, count)
+    
+    async def resume(self, client: WebSocketClient, client_type: str, since: int):
+        """Queue the events a reconnecting client missed after sequence ``since``.
+
+        Events still in the replay buffer come from memory. Only a gap older
+        than the buffer is read from the database, by when each event was
+        emitted, up to the oldest buffered event. Around the edges of the gap
+        an event may be sent twice, never skipped. Anything flushed after
+        this call is delivered live.
+        """
+        tail_filter = self.tail.filter_for(client) if client_type == "logs" else None
+        if tail_filter is not None and tail_filter.anomalies_only:
+            channel = "new_anomaly"
+        else:
+            channel = CHANNEL_TYPES[client_type]
+        buffer = self.replay[channel]
+        upto = self.flushed[channel]
+        missed = buffer.since(since, upto)
+        
+        if not buffer.covers(since):
+            boundary = missed[0][0] if missed else upto
+            try:
+                async with db_pool.acquire() as conn:
+                    rows = await conn.fetch(
+                        REPLAY_QUERIES[channel],
+                        sequence_time(since) - REPLAY_SLACK,
+                        sequence_time(boundary),
+                        REPLAY_DB_LIMIT,
+                    )
+            except Exception as e:
+                logger.error(f"WebSocket replay error: {str(e)}")
+                client.send_control({"type": "error", "detail": "Could not replay missed events"})
+                rows = []
+            # Rows predate every buffered event, so they resume from ``since`` again
+            missed = [(since, serialization.dumps(dict(row)).decode()) for row in reversed(rows)] + missed
+        
+        if tail_filter is not None and tail_filter != TailFilter(anomalies_only=tail_filter.anomalies_only):
+            missed = [event for event in missed if tail_filter.accepts(orjson.loads(event[1]))]
+        # Never replay more than the client's queue holds
+        missed = missed[-client.max_events:]
+        client.prepend(list(encode_frames(missed)))
     
-    async def broadcast(self, message: str, client_type: str):
-        for connection in self.active_connections[client_type]:
+    async def _flush_loop(self):
+        while True:
             try:
-                await connection.send_text(message)
-            except Exception:
-                # Handle disconnection or other errors
+                await asyncio.wait_for(self._flush_now.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
                 pass
+            self._flush_now.clear()
+            if self.pending_count:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"WebSocket flush error: {str(e)}")
+    
+    def start(self):
+        self._flush_now = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        for connections in self.active_connections.values():
+            for client in list(connections.values()):
+                client.stop()
 
 manager = ConnectionManager()
 
-# WebSocket endpoints
-@app.websocket("/ws/logs")
-async def websocket_logs(websocket: WebSocket):
-    await manager.connect(websocket, "logs")
+# Function to route hub notifications to WebSocket clients
+async def start_websocket_fanout():
+    manager.start()
+    for channel in CHANNEL_CLIENT_TYPES:
+        await notification_listener.subscribe(channel, functools.partial(manager.publish, channel))
+    notification_listener.subscribe_connect(manager.on_listener_connected)
+
+# Function to stop WebSocket delivery
+async def stop_websocket_fanout():
+    manager.stop()
+
+async def _set_tail_filter(client: WebSocketClient, message: str):
+    """Replace a /ws/logs client's filter with the LogSubscription it sent"""
+    try:
+        tail_filter = compile_subscription(LogSubscription.model_validate_json(message))
+    except (ValidationError, ValueError) as e:
+        client.send_control({"type": "error", "detail": str(e)})
+        return
+    manager.tail.subscribe(client, tail_filter)
+    client.send_control({"type": "subscribed"})
+
+async def _serve_websocket(websocket: WebSocket, client_type: str, on_message=None):
+    """Hold a client connection open; notifications reach it through the shared hub.
+
+    Query parameters: ``since`` resumes after the last ``seq`` the client
+    received. /ws/logs also takes its initial LogSubscription fields, so a
+    resumed stream is replayed through the client's filter.
+    """
+    params = websocket.query_params
+    tail_filter = None
+    try:
+        since = int(params["since"]) if "since" in params else None
+        if client_type == "logs":
+            subscription = {key: params[key] for key in LogSubscription.model_fields if key in params}
+            if "severity" in subscription:
+                subscription["severity"] = params.getlist("severity")
+            if subscription:
+                tail_filter = compile_subscription(LogSubscription.model_validate(subscription))
+    except (ValidationError, ValueError) as e:
+        await websocket.close(code=1008, reason=str(e)[:120])
+        return
     
-    # Listen for PostgreSQL notifications via LISTEN/NOTIFY
+    client = await manager.connect(websocket, client_type, tail_filter, start=since is None)
     try:
-        async with db_pool.acquire() as conn:
-            await conn.add_listener('new_log', lambda conn, pid, channel, payload: asyncio.create_task(
-                manager.broadcast(payload, "logs")
-            ))
-            
-            # Keep the connection alive
-            while True:
-                await websocket.receive_text()
+        if since is not None:
+            await manager.resume(client, client_type, since)
+            client.start()
+        # Keep the connection alive
+        while True:
+            message = await websocket.receive_text()
+            if on_message is not None:
+                await on_message(client, message)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, "logs")
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, "logs")
     finally:
-        # Clean up the listener when disconnected
-        async with db_pool.acquire() as conn:
-            await conn.remove_listener('new_log')
+        manager.disconnect(websocket, client_type)
+
+# WebSocket endpoints
+@app.websocket("/ws/logs")
+async def websocket_logs(websocket: WebSocket):
+    await _serve_websocket(websocket, "logs", on_message=_set_tail_filter)
 
 @app.websocket("/ws/anomalies")
 async def websocket_anomalies(websocket: WebSocket):
-    await manager.connect(websocket, "anomalies")
-    
-    try:
-        async with db_pool.acquire() as conn:
-            await conn.add_listener('new_anomaly', lambda conn, pid, channel, payload: asyncio.create_task(
-                manager.broadcast(payload, "anomalies")
-            ))
-            
-            while True:
-                await websocket.receive_text()
-    except WebSocketDisconnect:
-        manager.disconnect(websocket, "anomalies")
-    except Exception as e:
-        print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, "anomalies")
-    finally:
-        async with db_pool.acquire() as conn:
-            await conn.remove_listener('new_anomaly')
+    await _serve_websocket(websocket, "anomalies")
 
 @app.websocket("/ws/alerts")
 async def websocket_alerts(websocket: WebSocket):
-    await manager.connect(websocket, "alerts")
-    
+    await _serve_websocket(websocket, "alerts")
+
+# Keyset pagination limits for /logs/search
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(ts: datetime, log_id) -> str:
+    """Encode the (ts, id) of the last row on a page as an opaque continuation token"""
+    raw = json.dumps({"ts": ts.isoformat(), "id": str(log_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Decode a continuation token back into its (ts, id) keyset position"""
     try:
-        async with db_pool.acquire() as conn:
-            await conn.add_listener('new_alert', lambda conn, pid, channel, payload: asyncio.create_task(
-                manager.broadcast(payload, "alerts")
-            ))
-            
-            while True:
-                await websocket.receive_text()
-    except WebSocketDisconnect:
-        manager.disconnect(websocket, "alerts")
-    except Exception as e:
-        print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, "alerts")
-    finally:
-        async with db_pool.acquire() as conn:
-            await conn.remove_listener('new_alert')
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["ts"]), uuid.UUID(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Response layouts for /logs/search: a list of row objects, or one array per column
+SEARCH_LAYOUTS = ("rows", "columns")
 
 # Search logs endpoint
 @app.post("/logs/search")
 async def search_logs(
     search_params: LogSearch,
+    page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    layout: str = "rows",
+    count: Optional[str] = None,
     current_user: dict = Depends(get_current_active_user)
 ):
+    if layout not in SEARCH_LAYOUTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported layout: {layout}. Use one of: {', '.join(SEARCH_LAYOUTS)}"
+        )
+    if count is not None and count not in COUNT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported count mode: {count}. Use one of: {', '.join(COUNT_MODES)}"
+        )
+    
     try:
-        conditions = []
-        params = []
-        counter = 1
-        
-        if search_params.start_date:
-            conditions.append(f"ts >= ${counter}")
-            params.append(search_params.start_date)
-            counter += 1
+        after = decode_cursor(cursor) if cursor else None
+        log_filter = normalize_search(search_params)
+        cache_key = (log_filter, page_size, after, layout, count)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return FastJSONResponse(cached)
         
-        if search_params.end_date:
-            conditions.append(f"ts <= ${counter}")
-            params.append(search_params.end_date)
-            counter += 1
-        
-        if search_params.host:
-            if search_params.use_regex:
-                conditions.append(f"host ~* ${counter}")
-            else:
-                conditions.append(f"host ILIKE ${counter}")
-                search_params.host = f"%{search_params.host}%"
-            params.append(search_params.host)
-            counter += 1
-        
-        if search_params.app:
-            if search_params.use_regex:
-                conditions.append(f"app ~* ${counter}")
-            else:
-                conditions.append(f"app ILIKE ${counter}")
-                search_params.app = f"%{search_params.app}%"
-            params.append(search_params.app)
-            counter += 1
-        
-        if search_params.severity:
-            conditions.append(f"severity = ${counter}")
-            params.append(search_params.severity)
-            counter += 1
-        
-        if search_params.message:
-            if search_params.use_regex:
-                conditions.append(f"msg ~* ${counter}")
-            else:
-                conditions.append(f"msg ILIKE ${counter}")
-                search_params.message = f"%{search_params.message}%"
-            params.append(search_params.message)
-            counter += 1
-        
-        where_clause = " AND ".join(conditions) if conditions else "TRUE"
-        
-        query = f"""
-            SELECT id, ts, host, app, severity, msg, is_anomaly, anomaly_score
-            FROM logs
-            WHERE {where_clause}
-            ORDER BY ts DESC
-            LIMIT 1000
-        """
+        # Fetch one extra row to learn whether another page exists
+        query, params = build_search_query(log_filter, page_size + 1, after)
         
+        total = None
         async with db_pool.acquire() as conn:
             rows = await conn.fetch(query, *params)
-            
-        result = [dict(row) for row in rows]
-        return result
+            # Only the first page needs the total match count
+            if count and after is None:
+                total = await count_logs(conn, log_filter, count)
+        
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1]["ts"], rows[-1]["id"])
+        
+        # Records are encoded straight to bytes, and the bytes are what gets cached
+        body = serialization.dumps({
+            "logs": serialization.columnar(rows, LOG_COLUMNS) if layout == "columns" else serialization.records(rows),
+            "next_cursor": next_cursor,
+            "page_size": page_size,
+            "total": total
+        })
+        search_cache.put(cache_key, log_filter, body)
+        return FastJSONResponse(body)
     
+    except HTTPException:
+        raise
     except PostgresError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching logs: {str(e)}")
 
+# Search cache metrics endpoint
+@app.get("/logs/search/cache")
+async def get_search_cache_stats(current_user: dict = Depends(check_admin_role)):
+    return search_cache.stats()
+
+async def _fetch(query: str, *args):
+    async with acquire_fanout_connection() as conn:
+        return await conn.fetch(query, *args)
+
+async def _fetch_totals(count: str) -> Dict[str, Any]:
+    async with acquire_fanout_connection() as conn:
+        if count == "approximate":
+            total = await approximate_total(conn)
+            anomalies = await approximate_anomaly_count(conn, total["count"])
+            return {
+                "total_count": total["count"],
+                "anomaly_count": anomalies["count"],
+                "exact": total["exact"] and anomalies["exact"]
+            }
+        
+        row = await conn.fetchrow("""
+            SELECT
+                COALESCE(SUM(count), 0)::bigint AS total_count,
+                COALESCE(SUM(count) FILTER (WHERE is_anomaly), 0)::bigint AS anomaly_count
+            FROM logs_1h
+        """)
+        return {**dict(row), "exact": True}
+
+async def fetch_log_stats(count: str = "approximate") -> Dict[str, Any]:
+    """Compute dashboard statistics from the logs_1m/logs_1h continuous aggregates.
+    
+    The queries are independent, so they run concurrently, each on a pooled
+    connection taken within the DB_FANOUT_CONNECTIONS limit. With count="approximate" the total and anomaly counts come
+    from table statistics instead of summing the whole hourly rollup.
+    """
+    totals, severity_rows, host_rows, app_rows, trend_rows = await asyncio.gather(
+        # Get total and anomaly counts
+        _fetch_totals(count),
+        # Get counts by severity
+        _fetch("""
+            SELECT severity, SUM(count)::bigint as count
+            FROM logs_1h
+            GROUP BY severity
+            ORDER BY count DESC
+        """),
+        # Get counts by host
+        _fetch("""
+            SELECT host, SUM(count)::bigint as count
+            FROM logs_1h
+            GROUP BY host
+            ORDER BY count DESC
+            LIMIT 10
+        """),
+        # Get counts by application
+        _fetch("""
+            SELECT app, SUM(count)::bigint as count
+            FROM logs_1h
+            GROUP BY app
+            ORDER BY count DESC
+            LIMIT 10
+        """),
+        # Get last 24 hours trend (hourly), from minute buckets so the
+        # 24-hour window is cut at minute rather than hour precision
+        _fetch("""
+            SELECT 
+                time_bucket(INTERVAL '1 hour', bucket) as hour,
+                SUM(count)::bigint as count
+            FROM logs_1m
+            WHERE bucket >= NOW() - INTERVAL '24 hours'
+            GROUP BY hour
+            ORDER BY hour
+        """),
+    )
+    
+    total_count = totals["total_count"]
+    anomaly_count = totals["anomaly_count"]
+    anomaly_percentage = (anomaly_count / total_count * 100) if total_count > 0 else 0
+    
+    return {
+        "total_count": total_count,
+        "by_severity": [dict(row) for row in severity_rows],
+        "by_host": [dict(row) for row in host_rows],
+        "by_app": [dict(row) for row in app_rows],
+        "trend": [dict(row) for row in trend_rows],
+        "anomaly_count": anomaly_count,
+        "anomaly_percentage": anomaly_percentage,
+        "exact": totals["exact"]
+    }
+
 # Get log stats endpoint
 @app.get("/logs/stats")
-async def get_log_stats(current_user: dict = Depends(get_current_active_user)):
+async def get_log_stats(
+    count: str = "approximate",
+    current_user: dict = Depends(get_current_active_user)
+):
+    if count not in COUNT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported count mode: {count}. Use one of: {', '.join(COUNT_MODES)}"
+        )
     try:
-        async with db_pool.acquire() as conn:
-            # Get total count
-            total_count = await conn.fetchval("SELECT COUNT(*) FROM logs")
-            
-            # Get counts by severity
-            severity_rows = await conn.fetch("""
-                SELECT severity, COUNT(*) as count
-                FROM logs
-                GROUP BY severity
-                ORDER BY count DESC
-            """)
-            
-            # Get counts by host
-            host_rows = await conn.fetch("""
-                SELECT host, COUNT(*) as count
-                FROM logs
-                GROUP BY host
-                ORDER BY count DESC
-                LIMIT 10
-            """)
-            
-            # Get counts by application
-            app_rows = await conn.fetch("""
-                SELECT app, COUNT(*) as count
-                FROM logs
-                GROUP BY app
-                ORDER BY count DESC
-                LIMIT 10
-            """)
-            
-            # Get last 24 hours trend (hourly)
-            trend_rows = await conn.fetch("""
-                SELECT 
-                    date_trunc('hour', ts) as hour,
-                    COUNT(*) as count
-                FROM logs
-                WHERE ts >= NOW() - INTERVAL '24 hours'
-                GROUP BY hour
-                ORDER BY hour
-            """)
-            
-            # Get anomaly percentage
-            anomaly_count = await conn.fetchval("""
-                SELECT COUNT(*) FROM logs WHERE is_anomaly = true
-            """)
-            
-            anomaly_percentage = (anomaly_count / total_count * 100) if total_count > 0 else 0
-            
-        return {
-            "total_count": total_count,
-            "by_severity": [dict(row) for row in severity_rows],
-            "by_host": [dict(row) for row in host_rows],
-            "by_app": [dict(row) for row in app_rows],
-            "trend": [dict(row) for row in trend_rows],
-            "anomaly_count": anomaly_count,
-            "anomaly_percentage": anomaly_percentage
-        }
-    
+        return await fetch_log_stats(count)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving log stats: {str(e)}")
 
+# Live sliding-window stats endpoint, served from in-memory sketches
+@app.get("/logs/stats/live")
+async def get_live_log_stats(
+    window: str = "15m",
+    current_user: dict = Depends(get_current_active_user)
+):
+    if window not in WINDOWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported window: {window}. Use one of: {', '.join(WINDOWS)}"
+        )
+    return live_stats.snapshot(window)
+
+# Histogram defaults
+DEFAULT_HISTOGRAM_RANGE = timedelta(hours=24)
+MAX_HISTOGRAM_BUCKETS = 1000
+
+# Volume histogram endpoint
+@app.post("/logs/histogram")
+async def get_log_histogram(
+    search_params: LogSearch,
+    buckets: int = Query(60, ge=1, le=MAX_HISTOGRAM_BUCKETS),
+    group_by: Optional[str] = None,
+    max_series: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Log volume over any time range, optionally split by severity, host or app.
+    
+    The bucket width is picked from the range and the target bucket count.
+    Whenever the filters and width allow it, counts come from the
+    logs_1m/logs_1h rollups instead of raw chunks.
+    """
+    if group_by is not None and group_by not in HISTOGRAM_GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported group_by: {group_by}. Use one of: {', '.join(HISTOGRAM_GROUPS)}"
+        )
+    
+    # Naive datetimes are bound to timestamptz as UTC, so treat them that way here too
+    end_date = search_params.end_date or datetime.now(timezone.utc)
+    end_date = end_date if end_date.tzinfo else end_date.replace(tzinfo=timezone.utc)
+    start_date = search_params.start_date or end_date - DEFAULT_HISTOGRAM_RANGE
+    start_date = start_date if start_date.tzinfo else start_date.replace(tzinfo=timezone.utc)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    
+    try:
+        log_filter = normalize_search(search_params)._replace(start_date=start_date, end_date=end_date)
+        width = choose_bucket_width(start_date, end_date, buckets)
+        query, params, source = build_histogram_query(log_filter, width, group_by, max_series)
+        
+        rows = await _fetch(query, *params)
+        
+        return FastJSONResponse({
+            "start_date": start_date,
+            "end_date": end_date,
+            "bucket_seconds": int(width.total_seconds()),
+            "source": source,
+            "group_by": group_by,
+            "buckets": serialization.records(rows)
+        })
+    
+    except PostgresError as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building log histogram: {str(e)}")
+
+# Example logs returned per pattern
+PATTERN_EXAMPLES = 10
+
+async def fetch_log_patterns() -> List[Dict[str, Any]]:
+    """Read the top templates of the last 24 hours with a few example logs each.
+    
+    Templates and their hourly counters are maintained by the template
+    miner, so this only reads pre-aggregated counts plus examples fetched
+    through idx_logs_template.
+    """
+    patterns = await _fetch("""
+        WITH top_templates AS (
+            SELECT template_id, SUM(count)::bigint as count
+            FROM log_template_counts
+            WHERE bucket >= date_trunc('hour', NOW() - INTERVAL '24 hours')
+            GROUP BY template_id
+            HAVING SUM(count) >= 5
+            ORDER BY count DESC
+            LIMIT 10
+        )
+        SELECT 
+            t.id as template_id,
+            t.template as pattern,
+            tt.count,
+            COALESCE(examples.examples, '[]'::json) as examples
+        FROM top_templates tt
+        JOIN log_templates t ON t.id = tt.template_id
+        LEFT JOIN LATERAL (
+            SELECT json_agg(
+                json_build_object(
+                    'id', l.id,
+                    'ts', l.ts,
+                    'host', l.host,
+                    'app', l.app,
+                    'severity', l.severity,
+                    'msg', l.msg
+                )
+            ) as examples
+            FROM (
+                SELECT id, ts, host, app, severity, msg
+                FROM logs
+                WHERE template_id = t.id
+                AND ts >= NOW() - INTERVAL '24 hours'
+                ORDER BY ts DESC
+                LIMIT $1
+            ) l
+        ) examples ON TRUE
+        ORDER BY tt.count DESC
+    """, PATTERN_EXAMPLES)
+    
+    return [
+        {**dict(row), "examples": json.loads(row["examples"])}
+        for row in patterns
+    ]
+
 # Get log patterns endpoint
 @app.get("/logs/patterns")
 async def get_log_patterns(current_user: dict = Depends(get_current_active_user)):
     try:
-        async with db_pool.acquire() as conn:
-            # This is a simplified implementation
-            # In a production system, this would use more sophisticated pattern detection algorithms
-            patterns = await conn.fetch("""
-                WITH message_groups AS (
-                    SELECT 
-                        REGEXP_REPLACE(msg, '[0-9]+', '#') as pattern,
-                        COUNT(*) as count,
-                        array_agg(id) as example_ids
-                    FROM logs
-                    WHERE ts >= NOW() - INTERVAL '24 hours'
-                    GROUP BY pattern
-                    HAVING COUNT(*) >= 5
-                    ORDER BY count DESC
-                    LIMIT 10
-                )
-                SELECT 
-                    mg.pattern,
-                    mg.count,
-                    json_agg(
-                        json_build_object(
-                            'id', l.id,
-                            'ts', l.ts,
-                            'host', l.host,
-                            'app', l.app,
-                            'severity', l.severity,
-                            'msg', l.msg
-                        )
-                    ) as examples
-                FROM message_groups mg
-                JOIN logs l ON l.id = ANY(mg.example_ids)
-                GROUP BY mg.pattern, mg.count
-                LIMIT 100
-            """)
-            
-            return [dict(row) for row in patterns]
-    
+        return await fetch_log_patterns()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing log patterns: {str(e)}")
 
-# New endpoint for CSV/JSON export
+# Streaming export configuration
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columnar export schema. Low-cardinality text columns are dictionary encoded.
+EXPORT_ARROW_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("ts", pa.timestamp("us", tz="UTC")),
+    ("host", pa.dictionary(pa.int32(), pa.string())),
+    ("app", pa.dictionary(pa.int32(), pa.string())),
+    ("severity", pa.dictionary(pa.int32(), pa.string())),
+    ("msg", pa.string()),
+    ("is_anomaly", pa.bool_()),
+    ("anomaly_score", pa.float64()),
+])
+
+class _ExportSession:
+    """Pooled connection and read-only transaction held by one streaming export"""
+    
+    def __init__(self, conn, transaction):
+        self.conn = conn
+        self.transaction = transaction
+        self.released = False
+    
+    async def release(self):
+        # Called when the stream ends and again as the response's background
+        # task, which also runs when the body was never iterated
+        if self.released:
+            return
+        self.released = True
+        try:
+            if not self.transaction.is_completed():
+                await self.transaction.rollback()
+        finally:
+            await db_pool.release(self.conn)
+
+async def _export_batches(session, cursor, first_batch):
+    """Yield record batches from a server-side cursor, releasing the connection when done"""
+    try:
+        batch = first_batch
+        while batch:
+            yield batch
+            if len(batch) < EXPORT_BATCH_SIZE:
+                break
+            batch = await cursor.fetch(EXPORT_BATCH_SIZE)
+    finally:
+        await session.release()
+
+async def _stream_export(session, chunks):
+    """Drive the encoder chain, closing it and releasing the connection however the stream ends"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        try:
+            await chunks.aclose()
+        finally:
+            await session.release()
+
+async def _encode_json(batches):
+    first = True
+    yield b"["
+    async for batch in batches:
+        # Encode the whole batch as one array and splice off its brackets
+        rows = serialization.dumps(serialization.records(batch))[1:-1]
+        yield rows if first else b"," + rows
+        first = False
+    yield b"]"
+
+async def _encode_ndjson(batches):
+    async for batch in batches:
+        yield serialization.dumps_lines(batch)
+
+async def _encode_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LOG_COLUMNS)
+    async for batch in batches:
+        # Records iterate in column order, so they can be written without a dict
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink:
+    """Write-only file object that collects writer output for a streaming response"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def writable(self):
+        return True
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _arrow_record_batch(batch) -> pa.RecordBatch:
+    """Transpose asyncpg records straight into Arrow column arrays"""
+    ids, ts, hosts, apps, severities, msgs, is_anomaly, scores = zip(*batch)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array([str(log_id) for log_id in ids], pa.string()),
+            pa.array(ts, EXPORT_ARROW_SCHEMA.field("ts").type),
+            pa.array(hosts, pa.string()).dictionary_encode(),
+            pa.array(apps, pa.string()).dictionary_encode(),
+            pa.array(severities, pa.string()).dictionary_encode(),
+            pa.array(msgs, pa.string()),
+            pa.array(is_anomaly, pa.bool_()),
+            pa.array(scores, pa.float64()),
+        ],
+        schema=EXPORT_ARROW_SCHEMA,
+    )
+
+async def _encode_arrow(batches):
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, EXPORT_ARROW_SCHEMA)
+    async for batch in batches:
+        writer.write_batch(_arrow_record_batch(batch))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+async def _encode_parquet(batches):
+    sink = _ChunkSink()
+    # One row group per fetched batch, so each group can be flushed as it is written
+    writer = pq.ParquetWriter(
+        pa.PythonFile(sink, mode="w"),
+        EXPORT_ARROW_SCHEMA,
+        use_dictionary=["host", "app", "severity"],
+        compression="zstd",
+    )
+    async for batch in batches:
+        writer.write_batch(_arrow_record_batch(batch))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+async def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 emits a gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+EXPORT_ENCODERS = {
+    "json": _encode_json,
+    "ndjson": _encode_ndjson,
+    "csv": _encode_csv,
+    "arrow": _encode_arrow,
+    "parquet": _encode_parquet,
+}
+
+# Streaming CSV/JSON/NDJSON/Arrow/Parquet export
 @app.post("/logs/export")
 async def export_logs(
     search_params: LogSearch,
     format: str = "json",
+    gzip: bool = False,
     current_user: dict = Depends(get_current_active_user)
 ):
+    format = format.lower()
+    if format not in EXPORT_ENCODERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format: {format}. Use one of: {', '.join(EXPORT_ENCODERS)}"
+        )
+    
     try:
-        conditions = []
-        params = []
-        counter = 1
-        
-        if search_params.start_date:
-            conditions.append(f"ts >= ${counter}")
-            params.append(search_params.start_date)
-            counter += 1
-        
-        if search_params.end_date:
-            conditions.append(f"ts <= ${counter}")
-            params.append(search_params.end_date)
-            counter += 1
-        
-        if search_params.host:
-            if search_params.use_regex:
-                conditions.append(f"host ~* ${counter}")
-            else:
-                conditions.append(f"host ILIKE ${counter}")
-                search_params.host = f"%{search_params.host}%"
-            params.append(search_params.host)
-            counter += 1
-        
-        if search_params.app:
-            if search_params.use_regex:
-                conditions.append(f"app ~* ${counter}")
-            else:
-                conditions.append(f"app ILIKE ${counter}")
-                search_params.app = f"%{search_params.app}%"
-            params.append(search_params.app)
-            counter += 1
-        
-        if search_params.severity:
-            conditions.append(f"severity = ${counter}")
-            params.append(search_params.severity)
-            counter += 1
-        
-        if search_params.message:
-            if search_params.use_regex:
-                conditions.append(f"msg ~* ${counter}")
-            else:
-                conditions.append(f"msg ILIKE ${counter}")
-                search_params.message = f"%{search_params.message}%"
-            params.append(search_params.message)
-            counter += 1
+        query, params = build_export_query(normalize_search(search_params))
         
-        where_clause = " AND ".join(conditions) if conditions else "TRUE"
-        
-        query = f"""
-            SELECT id, ts, host, app, severity, msg, is_anomaly, anomaly_score
-            FROM logs
-            WHERE {where_clause}
-            ORDER BY ts DESC
-        """
-        
-        async with db_pool.acquire() as conn:
-            rows = await conn.fetch(query, *params)
-            
-        result = [dict(row) for row in rows]
-        
-        if format.lower() == "csv":
-            # Convert to CSV format
-            import csv
-            from io import StringIO
-            
-            output = StringIO()
-            if result:
-                writer = csv.DictWriter(output, fieldnames=result[0].keys())
-                writer.writeheader()
-                writer.writerows(result)
-                
-            return JSONResponse(
-                content={"csv_data": output.getvalue()},
-                headers={
-                    "Content-Disposition": f"attachment; filename=logs_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                }
-            )
-        else:
-            # JSON format (default)
-            return JSONResponse(
-                content=result,
-                headers={
-                    "Content-Disposition": f"attachment; filename=logs_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                }
-            )
+        # The connection is held for the life of the stream and released by
+        # _ExportSession when it ends. The first batch is fetched here so query errors
+        # still surface as a proper HTTP error before streaming starts.
+        conn = await db_pool.acquire()
+        transaction = conn.transaction(readonly=True)
+        try:
+            await transaction.start()
+            cursor = await conn.cursor(query, *params)
+            first_batch = await cursor.fetch(EXPORT_BATCH_SIZE)
+        except BaseException:
+            if not transaction.is_completed():
+                await transaction.rollback()
+            await db_pool.release(conn)
+            raise
     
     except PostgresError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting logs: {str(e)}")
+    
+    session = _ExportSession(conn, transaction)
+    body = EXPORT_ENCODERS[format](_export_batches(session, cursor, first_batch))
+    headers = {
+        "Content-Disposition": f"attachment; filename=logs_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    }
+    if gzip:
+        body = _gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        _stream_export(session, body),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+        background=BackgroundTask(session.release),
+    )
@@ -0,0 +1,54 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence
+
+import orjson
+from asyncpg import Record
+from fastapi.responses import Response
+
+# Fast JSON encoding for log-heavy responses.
+#
+# orjson serializes datetimes, UUIDs, tuples and lists natively, so query
+# results go to bytes without jsonable_encoder or pydantic validation.
+# orjson does not know asyncpg records: result sets are turned into dicts by
+# records(), which reads the column names once per result instead of once
+# per row. The default hook only catches stray records, one at a time.
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Record):
+        return dict(zip(obj.keys(), obj.values()))
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+def records(rows: Sequence[Record]) -> List[Dict[str, Any]]:
+    """Turn records of one result into dicts, reading the column names once"""
+    if not rows:
+        return []
+    keys = tuple(rows[0].keys())
+    return [dict(zip(keys, row.values())) for row in rows]
+
+def dumps_lines(rows: Sequence[Record]) -> bytes:
+    """Encode records as newline-delimited JSON.
+
+    orjson has no multi-document output, so this is one dumps call per row;
+    only the column names are shared across the batch.
+    """
+    return b"".join([orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in records(rows)])
+
+def columnar(rows: Sequence[Record], columns: Sequence[str]) -> Dict[str, Sequence[Any]]:
+    """Transpose records into {"column": [values...]}, the compact layout"""
+    values = list(zip(*rows)) if rows else [() for _ in columns]
+    return dict(zip(columns, values))
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson; pre-encoded bytes pass through untouched"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
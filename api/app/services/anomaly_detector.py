@@ -1,89 +1,602 @@
 import asyncio
-import json
 import logging
+import os
 import random
+import socket
+import time
 import uuid
-from datetime import datetime, timedelta, date
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+from scoring.anomaly_scoring import AnomalyScorer, scorer_from_env
 
 from .. import db_pool
+from ..serialization import dumps
+from .notifications import notification_listener, pack_payloads
+from .scoring_executor import INLINE, ScoringExecutor
+from .template_miner import template_miner
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("anomaly_detector")
 
+# Scores above this mark a log as an anomaly
+ANOMALY_THRESHOLD = 0.5
+
+# Messages are truncated in anomaly notifications to respect NOTIFY's payload limit
+NOTIFY_MSG_CHARS = 1000
+
+# Logs scored per batch; a full batch means a backlog, so the next one runs immediately
+BATCH_SIZE = int(os.environ.get("ANOMALY_BATCH_SIZE", "1000"))
+
+# Most rows counted when measuring the backlog
+LAG_COUNT_LIMIT = 100000
+
+# How new logs reach the detector: "poll" only follows the watermark,
+# "notify" also scores new_log notifications as they arrive
+POLL = "poll"
+NOTIFY = "notify"
+MODES = (POLL, NOTIFY)
+MODE = os.environ.get("ANOMALY_DETECTOR_MODE", POLL)
+if MODE not in MODES:
+    logger.warning(f"Unsupported ANOMALY_DETECTOR_MODE: {MODE}. Using {POLL}")
+    MODE = POLL
+
+# Notified logs are scored once this many are waiting, or once the oldest
+# has waited this many milliseconds
+MICRO_BATCH_SIZE = int(os.environ.get("ANOMALY_MICRO_BATCH_SIZE", "500"))
+MICRO_BATCH_MS = float(os.environ.get("ANOMALY_MICRO_BATCH_MS", "100"))
+# Notified logs held at most; beyond this they are left to the polling path
+MICRO_BATCH_MAX_PENDING = int(os.environ.get("ANOMALY_MICRO_BATCH_MAX_PENDING", "50000"))
+
+# Every instance receives every new_log notification. With several
+# instances in notify mode, each takes only the logs whose id hashes to its
+# shard; the other logs are left to their shard's instance, or to polling.
+NOTIFY_SHARDS = int(os.environ.get("ANOMALY_NOTIFY_SHARDS", "1"))
+NOTIFY_SHARD = int(os.environ.get("ANOMALY_NOTIFY_SHARD", "0"))
+if NOTIFY_SHARDS < 1 or not 0 <= NOTIFY_SHARD < NOTIFY_SHARDS:
+    logger.warning(f"Unsupported notify shard {NOTIFY_SHARD} of {NOTIFY_SHARDS}. Not sharding")
+    NOTIFY_SHARDS, NOTIFY_SHARD = 1, 0
+
+# Micro-batches whose notify latency is kept for status()
+LATENCY_SAMPLES = 1000
+
+# Row in anomaly_detector_state holding this detector's watermark
+WATERMARK_NAME = "api"
+
+# Seconds a claimed chunk is leased before other instances may take it over
+CHUNK_LEASE = float(os.environ.get("ANOMALY_CHUNK_LEASE", "60"))
+
+# Matches the start_offset of the logs_1m refresh policy in db/init/04-rollups.sql:
+# logs scored further back are only rolled up by refresh_rollups
+ROLLUP_POLICY_WINDOW = timedelta(hours=int(os.environ.get("ANOMALY_ROLLUP_POLICY_HOURS", "2")))
+
+# Identifies this process in chunk leases
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Last of the next $3 logs after the (ts, id) claim frontier, with how many
+# there are. "ts >= $1" keeps it a range scan on idx_logs_ts; the id
+# comparison only breaks ties.
+CHUNK_END_QUERY = """
+    SELECT ts, id, COUNT(*) OVER () AS rows
+    FROM (
+        SELECT ts, id
+        FROM logs
+        WHERE ts >= $1 AND (ts > $1 OR id > $2)
+        ORDER BY ts, id
+        LIMIT $3
+    ) chunk
+    ORDER BY ts DESC, id DESC
+    LIMIT 1
+"""
+
+# Take over the oldest chunk whose lease expired
+RECLAIM_CHUNK_QUERY = """
+    UPDATE anomaly_chunks
+    SET claimed_by = $1, lease_until = NOW() + make_interval(secs => $2)
+    WHERE id = (
+        SELECT id FROM anomaly_chunks
+        WHERE lease_until < NOW()
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, start_ts, start_id, end_ts, end_id
+"""
+
+# Logs of a chunk, (start_ts, start_id) exclusive to (end_ts, end_id)
+# inclusive, that are still waiting for a score
+CHUNK_QUERY = """
+    SELECT id, ts, host, app, severity, msg
+    FROM logs
+    WHERE ts BETWEEN $1 AND $3
+    AND (ts > $1 OR id > $2) AND (ts < $3 OR id <= $4)
+    AND anomaly_score IS NULL
+    ORDER BY ts, id
+"""
+
+# Logs that arrived with a timestamp already behind every chunk, found
+# through the partial index idx_logs_unscored
+LATE_BATCH_QUERY = """
+    SELECT id, ts, host, app, severity, msg
+    FROM logs
+    WHERE anomaly_score IS NULL AND ts < $1
+    ORDER BY ts
+    LIMIT $2
+"""
+
+# Lock the logs of a batch that are still unscored, skipping those that
+# another instance is scoring right now
+CLAIM_LOGS_QUERY = """
+    SELECT id
+    FROM logs
+    WHERE id = ANY($1::uuid[]) AND ts BETWEEN $2 AND $3
+    AND anomaly_score IS NULL
+    FOR UPDATE SKIP LOCKED
+"""
+
 class AnomalyDetector:
-    def __init__(self):
+    """Scores logs in (ts, id) order behind a persisted claim frontier.
+
+    Any number of instances, in one or many API processes, split the log
+    stream into chunks. Claiming a chunk leases the next ``batch_size`` logs
+    after the frontier in anomaly_detector_state and moves the frontier past
+    them; the row lock on the frontier keeps claims from overlapping. The
+    chunk's scores are written back in the same transaction that deletes its
+    lease, so nothing is skipped, even across restarts. A chunk whose lease
+    expires is taken over by another instance.
+
+    While a backlog exists chunks run back to back; the detector only
+    sleeps once caught up. Logs that arrive with a timestamp older than the
+    frontier are picked up from the unscored partial index. Once a backlog
+    older than the rollup refresh policy has been scored, the rollups are
+    refreshed over it so dashboard counts pick up the new anomaly flags.
+
+    In notify mode new_log notifications are also collected into
+    micro-batches and scored as soon as a batch fills up or its oldest log
+    has waited ``micro_batch_ms``. Polling then only catches what the
+    notifications missed.
+
+    Every write-back first locks the logs it scores with ``FOR UPDATE SKIP
+    LOCKED`` and drops those already scored, so a log reached by several
+    paths or instances is scored and notified once.
+    """
+
+    def __init__(
+        self,
+        scorer: AnomalyScorer = None,
+        batch_size: int = BATCH_SIZE,
+        mode: str = MODE,
+        micro_batch_size: int = MICRO_BATCH_SIZE,
+        micro_batch_ms: float = MICRO_BATCH_MS,
+        max_pending: int = MICRO_BATCH_MAX_PENDING,
+        notify_shards: int = NOTIFY_SHARDS,
+        notify_shard: int = NOTIFY_SHARD,
+    ):
         self.is_running = False
         self.processing_interval = 20  # seconds
+        self.scorer = scorer or scorer_from_env()
+        self.executor = ScoringExecutor(self.scorer)
+        self.batch_size = batch_size
+        self.watermark = None
+        self.processed = 0
+        self.late_processed = 0
+        self.lag_seconds = 0.0
+        self.lag_rows = 0
+        self.chunks_in_flight = 0
+        self.reclaimed_chunks = 0
+        self.last_cycle_at = None
+        # Oldest log scored behind the rollup refresh policy, not rolled up yet
+        self.rollup_stale_since = None
+        self.rollup_refreshes = 0
+        self.mode = mode
+        self.micro_batch_size = micro_batch_size
+        self.micro_batch_delay = micro_batch_ms / 1000
+        self.max_pending = max_pending
+        self.notify_shards = notify_shards
+        self.notify_shard = notify_shard
+        # Notified logs waiting for a micro-batch, as (arrival time, log)
+        self.pending = []
+        self.micro_batches = 0
+        self.notified_processed = 0
+        self.notify_dropped = 0
+        self.notify_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._subscribed = False
+        self._wakeup = asyncio.Event()
+        self._micro_batch_task = None
+        # Template mining from both paths runs one batch at a time
+        self._template_lock = asyncio.Lock()
         
     async def start(self):
         """Start the anomaly detection process"""
         self.is_running = True
-        logger.info("Starting anomaly detection service")
+        logger.info(f"Starting anomaly detection service in {self.mode} mode")
+        self.executor.start()
+        if self.mode == NOTIFY:
+            if not self._subscribed:
+                await notification_listener.subscribe("new_log", self.on_new_log)
+                self._subscribed = True
+            self._micro_batch_task = asyncio.create_task(self.micro_batch_loop())
         await self.detection_loop()
     
     async def stop(self):
         """Stop the anomaly detection process"""
         self.is_running = False
+        if self._micro_batch_task is not None:
+            self._micro_batch_task.cancel()
+            self._micro_batch_task = None
+        self.pending = []
+        self.executor.stop()
         logger.info("Stopping anomaly detection service")
     
+    def on_new_log(self, payload: str):
+        """Queue a new_log notification for the next micro-batch"""
+        if not self.is_running:
+            return
+        if len(self.pending) >= self.max_pending:
+            self.notify_dropped += 1
+            return
+        try:
+            event = orjson.loads(payload)
+            log_id = uuid.UUID(event["id"])
+            if log_id.int % self.notify_shards != self.notify_shard:
+                # Another instance's shard
+                return
+            ts = datetime.fromisoformat(event["ts"])
+            log = {
+                "id": log_id,
+                "ts": ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc),
+                "host": event.get("host"),
+                "app": event.get("app"),
+                "severity": event.get("severity"),
+                "msg": event.get("msg") or "",
+            }
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError):
+            # Polling still finds the log
+            self.notify_dropped += 1
+            return
+        if not self.pending:
+            self._wakeup.set()
+        self.pending.append((time.monotonic(), log))
+        if len(self.pending) >= self.micro_batch_size:
+            self._wakeup.set()
+    
+    async def micro_batch_loop(self):
+        """Score notified logs in micro-batches as they fill up or age out"""
+        while self.is_running:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self.pending:
+                continue
+            # Give a partial batch until its oldest log's deadline to fill up
+            delay = self.pending[0][0] + self.micro_batch_delay - time.monotonic()
+            if len(self.pending) < self.micro_batch_size and delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            
+            batch = self.pending[:self.micro_batch_size]
+            self.pending = self.pending[self.micro_batch_size:]
+            # Latency is measured from the oldest log of this batch, not of the queue
+            received = batch[0][0]
+            if self.pending:
+                # The rest arrived while this batch was waiting; flush it next
+                self._wakeup.set()
+            
+            try:
+                async with db_pool.acquire() as conn:
+                    self.notified_processed += await self.score_logs(conn, [log for _, log in batch])
+                self.micro_batches += 1
+                self.notify_latencies.append(time.monotonic() - received)
+            except Exception as e:
+                # Polling scores these logs once it reaches them
+                logger.error(f"Error scoring notified logs: {str(e)}")
+    
     async def detection_loop(self):
         """Main loop for anomaly detection"""
         while self.is_running:
             try:
-                await self.process_recent_logs()
-                # Wait before next processing cycle
-                await asyncio.sleep(self.processing_interval)
+                caught_up = await self.process_recent_logs()
+                # Only wait once the backlog is gone
+                if caught_up:
+                    await asyncio.sleep(self.processing_interval)
             except Exception as e:
                 logger.error(f"Error in anomaly detection loop: {str(e)}")
                 await asyncio.sleep(self.processing_interval)
     
-    async def process_recent_logs(self):
-        """Process recent logs to detect anomalies"""
+    async def process_recent_logs(self) -> bool:
+        """Score the next chunk of logs; return True once caught up"""
+        async with db_pool.acquire() as conn:
+            chunk, caught_up = await self.claim_chunk(conn)
+            if chunk is not None:
+                logs = await conn.fetch(
+                    CHUNK_QUERY, chunk["start_ts"], chunk["start_id"], chunk["end_ts"], chunk["end_id"]
+                )
+                self.processed += await self.score_logs(conn, logs, chunk_id=chunk["id"])
+            
+            self.last_cycle_at = datetime.now(timezone.utc)
+            if self.watermark is None:
+                # Only taken over an expired chunk so far; no frontier read yet
+                return caught_up
+            
+            self.chunks_in_flight, oldest_chunk = await conn.fetchrow(
+                "SELECT COUNT(*), MIN(start_ts) FROM anomaly_chunks"
+            )
+            # Everything before the oldest outstanding chunk has been scored
+            low_watermark = min(oldest_chunk, self.watermark[0]) if oldest_chunk else self.watermark[0]
+            
+            if caught_up:
+                late = await conn.fetch(LATE_BATCH_QUERY, low_watermark, self.batch_size)
+                if late:
+                    logger.info(f"Scoring {len(late)} logs that arrived behind the watermark")
+                    self.late_processed += await self.score_logs(conn, late)
+            
+            await self.measure_lag(conn, caught_up, low_watermark)
+            if caught_up and self.rollup_stale_since is not None:
+                await self.refresh_rollups(conn)
+            return caught_up
+    
+    async def claim_chunk(self, conn):
+        """Lease the next chunk of logs to score; return (chunk, caught_up).
+
+        Chunks whose lease expired are taken over first. Otherwise the next
+        logs after the frontier become a new chunk, and the frontier moves
+        past them.
+        """
+        async with conn.transaction():
+            chunk = await conn.fetchrow(RECLAIM_CHUNK_QUERY, WORKER_ID, CHUNK_LEASE)
+            if chunk is not None:
+                logger.warning(f"Taking over expired anomaly chunk {chunk['id']}")
+                self.reclaimed_chunks += 1
+                return chunk, False
+            
+            self.watermark = await self.lock_frontier(conn)
+            end = await conn.fetchrow(CHUNK_END_QUERY, *self.watermark, self.batch_size)
+            if end is None:
+                return None, True
+            
+            chunk = await conn.fetchrow(
+                """
+                INSERT INTO anomaly_chunks (start_ts, start_id, end_ts, end_id, claimed_by, lease_until)
+                VALUES ($1, $2, $3, $4, $5, NOW() + make_interval(secs => $6))
+                RETURNING id, start_ts, start_id, end_ts, end_id
+                """,
+                *self.watermark,
+                end["ts"],
+                end["id"],
+                WORKER_ID,
+                CHUNK_LEASE,
+            )
+            await conn.execute(
+                """
+                UPDATE anomaly_detector_state
+                SET last_ts = $2, last_id = $3, updated_at = NOW()
+                WHERE name = $1
+                """,
+                WATERMARK_NAME,
+                end["ts"],
+                end["id"],
+            )
+        self.watermark = end["ts"], end["id"]
+        return chunk, end["rows"] < self.batch_size
+    
+    async def refresh_rollups(self, conn):
+        """Roll up anomaly flags written behind the rollup refresh policy.
+
+        The policy only refreshes the last ``ROLLUP_POLICY_WINDOW``, so counts
+        of older buckets would keep the flags they had before a catch-up.
+        """
+        # Only buckets wholly inside the window are refreshed, so start on an
+        # hour boundary to include the minute and hour the backlog began in
+        start = self.rollup_stale_since.replace(minute=0, second=0, microsecond=0)
+        end = datetime.now(timezone.utc) - ROLLUP_POLICY_WINDOW
+        self.rollup_stale_since = None
+        logger.info(f"Refreshing log rollups from {start.isoformat()} after scoring a backlog")
         try:
-            async with db_pool.acquire() as conn:
-                # Get logs from the last 5 minutes that haven't been processed for anomalies yet
-                query = """
-                    SELECT id, ts, host, app, severity, msg
-                    FROM logs
-                    WHERE ts >= NOW() - INTERVAL '5 minutes'
-                    AND anomaly_score IS NULL
-                    ORDER BY ts DESC
-                    LIMIT 1000
+            await conn.execute("CALL refresh_continuous_aggregate('logs_1m', $1, $2)", start, end)
+            await conn.execute("CALL refresh_continuous_aggregate('logs_1h', $1, $2)", start, end)
+            self.rollup_refreshes += 1
+        except Exception:
+            # Retry on the next caught-up cycle
+            self.rollup_stale_since = start
+            raise
+    
+    async def lock_frontier(self, conn):
+        """Lock and return the claim frontier, creating it on first use"""
+        query = "SELECT last_ts, last_id FROM anomaly_detector_state WHERE name = $1 FOR UPDATE"
+        row = await conn.fetchrow(query, WATERMARK_NAME)
+        if row is None:
+            # First run: start just before the oldest log still waiting for a score
+            oldest = await conn.fetchval("SELECT MIN(ts) FROM logs WHERE anomaly_score IS NULL")
+            start = oldest - timedelta(microseconds=1) if oldest else datetime.now(timezone.utc)
+            await conn.execute(
                 """
-                logs = await conn.fetch(query)
-                
-                if not logs:
-                    return
-                
-                logger.info(f"Processing {len(logs)} logs for anomalies")
-                
-                # Process each log
-                for log in logs:
-                    log_dict = dict(log)
-                    anomaly_score = self.calculate_anomaly_score(log_dict)
-                    is_anomaly = anomaly_score > 0.5
-                    
-                    # Update database with anomaly score
-                    update_query = """
-                        UPDATE logs
-                        SET anomaly_score = $1, is_anomaly = $2
-                        WHERE id = $3
-                    """
-                    await conn.execute(update_query, anomaly_score, is_anomaly, log_dict["id"])
-                    
-                    # If it's an anomaly, notify via PostgreSQL NOTIFY
-                    if is_anomaly:
-                        log_dict["anomaly_score"] = anomaly_score
-                        await conn.execute(
-                            "SELECT pg_notify($1, $2)",
-                            "new_anomaly",
-                            json.dumps(log_dict, default=self.json_serial)
-                        )
-                        logger.info(f"Detected anomaly: {log_dict['id']} Score: {anomaly_score}")
-                
-        except Exception as e:
-            logger.error(f"Error processing logs for anomalies: {str(e)}")
+                INSERT INTO anomaly_detector_state (name, last_ts, last_id)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (name) DO NOTHING
+                """,
+                WATERMARK_NAME,
+                start,
+                uuid.UUID(int=0),
+            )
+            row = await conn.fetchrow(query, WATERMARK_NAME)
+        return row["last_ts"], row["last_id"]
+    
+    async def measure_lag(self, conn, caught_up: bool, low_watermark: datetime):
+        """Update the backlog behind the watermark, in seconds and rows"""
+        if caught_up:
+            self.lag_seconds = 0.0
+            self.lag_rows = 0
+            return
+        newest = await conn.fetchval("SELECT MAX(ts) FROM logs")
+        self.lag_seconds = max((newest - low_watermark).total_seconds(), 0.0) if newest else 0.0
+        self.lag_rows = await conn.fetchval(
+            """
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM logs WHERE ts >= $1 AND (ts > $1 OR id > $2) LIMIT $3
+            ) backlog
+            """,
+            *self.watermark,
+            LAG_COUNT_LIMIT,
+        )
+        logger.info(f"Anomaly detector behind by {self.lag_seconds:.0f}s, {self.lag_rows} logs")
+    
+    def status(self) -> dict:
+        latencies = sorted(self.notify_latencies)
+        notify_latency_ms = None
+        if latencies:
+            notify_latency_ms = {
+                "p50": latencies[len(latencies) // 2] * 1000,
+                "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+                "max": latencies[-1] * 1000,
+            }
+        return {
+            "running": self.is_running,
+            "mode": self.mode,
+            "notify_shard": f"{self.notify_shard}/{self.notify_shards}",
+            "worker": WORKER_ID,
+            "watermark": {"ts": self.watermark[0], "id": self.watermark[1]} if self.watermark else None,
+            "lag_seconds": self.lag_seconds,
+            "lag_rows": self.lag_rows,
+            "lag_rows_capped": self.lag_rows >= LAG_COUNT_LIMIT,
+            "chunks_in_flight": self.chunks_in_flight,
+            "reclaimed_chunks": self.reclaimed_chunks,
+            "processed": self.processed,
+            "late_processed": self.late_processed,
+            "last_cycle_at": self.last_cycle_at,
+            "rollup_stale_since": self.rollup_stale_since,
+            "rollup_refreshes": self.rollup_refreshes,
+            "micro_batches": self.micro_batches,
+            "notified_processed": self.notified_processed,
+            "notify_pending": len(self.pending),
+            "notify_dropped": self.notify_dropped,
+            "notify_latency_ms": notify_latency_ms,
+            "scoring": self.executor.stats(),
+        }
+    
+    async def score_logs(self, conn, logs, chunk_id=None) -> int:
+        """Claim, score and write back a batch, notifying its anomalies.
+
+        Templates are mined and persisted first, on ``conn`` and outside
+        any transaction, so their ids survive a rollback and no second pool
+        connection is needed while rows are locked. The rest runs in one
+        transaction, which also deletes the lease of ``chunk_id`` when
+        given. Logs that are already scored, or locked by another instance
+        that is scoring them, are skipped. Only the logs scored here count
+        toward their templates. Returns how many logs were scored.
+        """
+        clusters = await self.assign_templates(conn, logs) if logs else []
+        async with conn.transaction():
+            if logs:
+                claimed = await conn.fetch(
+                    CLAIM_LOGS_QUERY,
+                    [log["id"] for log in logs],
+                    min(log["ts"] for log in logs),
+                    max(log["ts"] for log in logs),
+                )
+                claimed_ids = {row["id"] for row in claimed}
+                kept = [(log, cluster) for log, cluster in zip(logs, clusters) if log["id"] in claimed_ids]
+                logs = [log for log, _ in kept]
+                clusters = [cluster for _, cluster in kept]
+            if logs:
+                await self.write_back(conn, logs, clusters)
+            if chunk_id is not None:
+                await conn.execute("DELETE FROM anomaly_chunks WHERE id = $1", chunk_id)
+        if logs:
+            await self.count_templates(conn, logs, clusters)
+            oldest = min(log["ts"] for log in logs)
+            if oldest < datetime.now(timezone.utc) - ROLLUP_POLICY_WINDOW and (
+                self.rollup_stale_since is None or oldest < self.rollup_stale_since
+            ):
+                self.rollup_stale_since = oldest
+        return len(logs)
+    
+    async def write_back(self, conn, logs, clusters):
+        """Score claimed logs and write them back, with their templates, inside the caller's transaction"""
+        scores = await self.executor.score_logs(logs)
+        await conn.execute(
+            """
+            UPDATE logs l
+            SET anomaly_score = u.score, is_anomaly = u.is_anomaly, template_id = u.template_id, scored_at = NOW()
+            FROM unnest($1::uuid[], $2::timestamptz[], $3::float8[], $4::bool[], $5::bigint[])
+                AS u(id, ts, score, is_anomaly, template_id)
+            WHERE l.id = u.id AND l.ts = u.ts
+            AND l.ts BETWEEN $6 AND $7
+            """,
+            [log["id"] for log in logs],
+            [log["ts"] for log in logs],
+            scores,
+            [score > ANOMALY_THRESHOLD for score in scores],
+            [cluster.id for cluster in clusters],
+            min(log["ts"] for log in logs),
+            max(log["ts"] for log in logs),
+        )
+        
+        # Tell search caches which time range changed; NOTIFY is delivered
+        # when the transaction commits
+        await conn.execute(
+            "SELECT pg_notify('logs_scored', $1)",
+            dumps({"start": min(log["ts"] for log in logs), "end": max(log["ts"] for log in logs)}).decode(),
+        )
+        
+        # Notify all anomalies of the batch together
+        anomalies = [
+            {
+                "id": log["id"],
+                "ts": log["ts"],
+                "host": log["host"],
+                "app": log["app"],
+                "severity": log["severity"],
+                "msg": log["msg"][:NOTIFY_MSG_CHARS],
+                "anomaly_score": score,
+            }
+            for log, score in zip(logs, scores)
+            if score > ANOMALY_THRESHOLD
+        ]
+        if anomalies:
+            await conn.execute(
+                "SELECT pg_notify('new_anomaly', payload) FROM unnest($1::text[]) AS payload",
+                pack_payloads([dumps(anomaly) for anomaly in anomalies]),
+            )
+            logger.info(f"Detected {len(anomalies)} anomalies in {len(logs)} logs")
+    
+    async def assign_templates(self, conn, logs) -> list:
+        """Assign every log a template and persist new templates so they have ids.
+
+        ``conn`` must not be inside a transaction: the ids have to survive
+        if the caller's claim transaction rolls back.
+        """
+        async with self._template_lock:
+            await template_miner.ensure_loaded(conn)
+            if self.executor.kind == INLINE:
+                clusters = self.mine_templates(logs)
+            else:
+                # The miner is only touched under the template lock, so a
+                # thread can take the mining off the event loop
+                clusters = await asyncio.to_thread(self.mine_templates, logs)
+            await template_miner.flush(conn)
+        return clusters
+    
+    async def count_templates(self, conn, logs, clusters):
+        """Count committed logs toward their templates; a failed flush is retried by the next one"""
+        async with self._template_lock:
+            for log, cluster in zip(logs, clusters):
+                template_miner.count(cluster, log["ts"])
+            try:
+                await template_miner.flush(conn)
+            except Exception as e:
+                logger.error(f"Error saving template counts: {str(e)}")
+    
+    def mine_templates(self, logs) -> list:
+        return [template_miner.add(log["msg"]) for log in logs]
+    
+    def score_batch(self, logs) -> list:
+        """Score a batch of logs, in order"""
+        return self.scorer.score_logs(logs)
     
     def calculate_anomaly_score(self, log: dict) -> float:
         """Calculate an anomaly score for a log entry
@@ -91,48 +604,7 @@ class AnomalyDetector:
         In a real implementation, this would use a more sophisticated algorithm
         like Isolation Forest, LOF, or a trained ML model.
         """
-        # This is a simplified example for demonstration purposes
-        score = 0.0
-        
-        # Check for severity
-        if log["severity"] in ["emergency", "alert", "critical"]:
-            score += 0.4
-        elif log["severity"] == "error":
-            score += 0.3
-        elif log["severity"] == "warning":
-            score += 0.1
-        
-        # Check for keywords in message
-        message = log["msg"].lower()
-        keywords = {
-            "error": 0.2,
-            "failed": 0.2,
-            "exception": 0.3,
-            "timeout": 0.25,
-            "critical": 0.3,
-            "crash": 0.35,
-            "unavailable": 0.3,
-            "refused": 0.25,
-            "denied": 0.2,
-            "exceeded": 0.2,
-            "overflow": 0.3,
-            "deadlock": 0.4,
-            "corrupt": 0.4
-        }
-        
-        for keyword, weight in keywords.items():
-            if keyword in message:
-                score += weight
-        
-        # Cap the score at 1.0
-        return min(score, 1.0)
-    
-    @staticmethod
-    def json_serial(obj):
-        """JSON serializer for objects not serializable by default json code"""
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        raise TypeError("Type not serializable")
+        return self.score_batch([log])[0]
 
 # Create a global instance of the anomaly detector
 anomaly_detector = AnomalyDetector()
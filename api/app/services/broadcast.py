@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger("broadcast")
+
+# What to do when a client's queue is full
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (DROP_OLDEST, DISCONNECT)
+
+# Events buffered per client before the overflow policy applies
+QUEUE_SIZE = int(os.environ.get("WS_QUEUE_SIZE", "5000"))
+# Most events sent in one frame; a full batch is flushed without waiting
+BATCH_SIZE = int(os.environ.get("WS_BATCH_SIZE", "500"))
+# Seconds notifications are coalesced before being sent
+FLUSH_INTERVAL = float(os.environ.get("WS_FLUSH_INTERVAL", "0.05"))
+# Seconds a single frame may take to send before the client is considered dead
+SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "10"))
+OVERFLOW_POLICY = os.environ.get("WS_OVERFLOW_POLICY", DROP_OLDEST)
+if OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+    logger.warning(f"Unsupported WS_OVERFLOW_POLICY: {OVERFLOW_POLICY}. Using {DROP_OLDEST}")
+    OVERFLOW_POLICY = DROP_OLDEST
+
+# Close code sent to clients disconnected for falling behind ("Try Again Later")
+LAGGING_CLOSE_CODE = 1013
+
+# Recent notifications kept per channel so reconnecting clients can resume
+REPLAY_SIZE = int(os.environ.get("WS_REPLAY_SIZE", "10000"))
+REPLAY_BYTES = int(os.environ.get("WS_REPLAY_BYTES", str(16 * 1024 * 1024)))
+
+# A notification payload tagged with its sequence number
+Event = Tuple[int, str]
+
+_last_sequence = 0
+
+def next_sequence() -> int:
+    """Return the next event sequence number.
+
+    Sequences are microseconds since the epoch, bumped by one when events
+    arrive faster than the clock ticks. They keep increasing across restarts
+    and map back to an approximate publish time, which is what the database
+    fallback of a resume needs.
+    """
+    global _last_sequence
+    _last_sequence = max(_last_sequence + 1, time.time_ns() // 1000)
+    return _last_sequence
+
+def sequence_time(seq: int) -> datetime:
+    return datetime.fromtimestamp(seq / 1_000_000, tz=timezone.utc)
+
+def encode_frames(events: List[Event], size: int = BATCH_SIZE) -> Iterator[Tuple[str, int]]:
+    """Split sequenced events into frames of at most ``size`` events.
+
+    A frame is ``{"seq": <last sequence>, "events": [...]}``. Payloads are
+    already JSON text, so frames are joined without re-encoding.
+    """
+    for start in range(0, len(events), size):
+        chunk = events[start:start + size]
+        payloads = ",".join(payload for _, payload in chunk)
+        yield f'{{"seq":{chunk[-1][0]},"events":[{payloads}]}}', len(chunk)
+
+class ReplayBuffer:
+    """Ring buffer of one channel's most recent events, bounded by count and bytes"""
+
+    def __init__(self, max_events: int = REPLAY_SIZE, max_bytes: int = REPLAY_BYTES):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.events: Deque[Event] = deque()
+        self.bytes = 0
+        # Everything up to this sequence, including what predates this
+        # process, is no longer held and must come from the database
+        self.evicted = next_sequence()
+
+    def append(self, seq: int, payload: str):
+        self.events.append((seq, payload))
+        self.bytes += len(payload)
+        while len(self.events) > self.max_events or (self.bytes > self.max_bytes and len(self.events) > 1):
+            evicted, dropped = self.events.popleft()
+            self.bytes -= len(dropped)
+            self.evicted = evicted
+
+    def reset(self):
+        """Forget every event, so resumes from before now come from the database"""
+        self.events.clear()
+        self.bytes = 0
+        self.evicted = next_sequence()
+
+    def covers(self, since: int) -> bool:
+        return since >= self.evicted
+
+    def since(self, since: int, upto: int) -> List[Event]:
+        """Events with ``since < seq <= upto``, oldest first"""
+        missed = []
+        for seq, payload in reversed(self.events):
+            if seq <= since:
+                break
+            if seq <= upto:
+                missed.append((seq, payload))
+        missed.reverse()
+        return missed
+
+class WebSocketClient:
+    """One connected WebSocket with its own bounded queue and sender task.
+
+    Frames are queued without awaiting the socket, so a slow client only
+    ever delays itself. When more than ``max_events`` are waiting, the
+    overflow policy either drops the oldest frames or disconnects the client
+    with a "lagging" notice. A send that fails or times out closes the
+    socket, which ends the handler's receive loop, and ``on_close`` prunes
+    the client from its manager.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_close: Callable[["WebSocketClient"], None],
+        max_events: int = QUEUE_SIZE,
+        policy: str = OVERFLOW_POLICY,
+        send_timeout: float = SEND_TIMEOUT,
+    ):
+        self.websocket = websocket
+        self.on_close = on_close
+        self.max_events = max_events
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.frames: Deque[Tuple[str, int]] = deque()
+        self.queued_events = 0
+        self.dropped = 0
+        self.closed = False
+        self._close_code: Optional[int] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._sender())
+
+    def prepend(self, frames: List[Tuple[str, int]]):
+        """Queue replayed frames ahead of any live frames already waiting"""
+        for frame, events in reversed(frames):
+            self.frames.appendleft((frame, events))
+            self.queued_events += events
+        if self.frames:
+            self._ready.set()
+
+    def stop(self):
+        self.closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    def enqueue(self, frame: str, events: int):
+        if self.closed or self._close_code is not None:
+            return
+        if self.queued_events + events > self.max_events:
+            if self.policy == DISCONNECT:
+                self._disconnect_lagging()
+                return
+            while self.frames and self.queued_events + events > self.max_events:
+                _, dropped = self.frames.popleft()
+                self.queued_events -= dropped
+                self.dropped += dropped
+        self.frames.append((frame, events))
+        self.queued_events += events
+        self._ready.set()
+
+    def send_control(self, message: dict):
+        """Queue a control message; it does not count toward the queue size"""
+        if self.closed or self._close_code is not None:
+            return
+        self.frames.append((json.dumps(message), 0))
+        self._ready.set()
+
+    def _disconnect_lagging(self):
+        dropped = self.queued_events
+        self.frames.clear()
+        self.queued_events = 0
+        self.dropped += dropped
+        self.frames.append((json.dumps({"type": "lagging", "dropped": dropped}), 0))
+        self._close_code = LAGGING_CLOSE_CODE
+        self._ready.set()
+
+    async def _sender(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self.frames:
+                    frame, events = self.frames.popleft()
+                    self.queued_events -= events
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+                self._ready.clear()
+                if self._close_code is not None:
+                    await asyncio.wait_for(self.websocket.close(code=self._close_code), self.send_timeout)
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Dropping WebSocket client: {type(e).__name__}: {e}")
+            # Close the socket too, or the handler would keep waiting on a dead client
+            try:
+                await asyncio.wait_for(self.websocket.close(), self.send_timeout)
+            except Exception:
+                pass
+        self.closed = True
+        self.on_close(self)
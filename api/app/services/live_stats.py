@@ -0,0 +1,311 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import socket
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from scoring.severity import SEVERITIES, SEVERITY_INDEX
+
+from .notifications import notification_listener
+
+logger = logging.getLogger("live_stats")
+
+# Supported sliding windows, in seconds
+WINDOWS = {"1m": 60, "15m": 900, "1h": 3600, "24h": 86400}
+
+@lru_cache(maxsize=65536)
+def _hash64(value: str) -> int:
+    # Hosts and apps repeat constantly, so their hashes are memoized
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**precision one-byte registers"""
+
+    def __init__(self, precision: int = 10, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: str):
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+class SpaceSaving:
+    """SpaceSaving heavy-hitter summary holding at most ``capacity`` counters"""
+
+    def __init__(self, capacity: int, counts: Optional[Dict[str, int]] = None):
+        self.capacity = capacity
+        self.counts = counts if counts is not None else {}
+
+    def add(self, key: str, count: int = 1):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            # Replace the smallest counter, inheriting its count as the error bound
+            victim = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(victim) + count
+
+    def merge(self, other: "SpaceSaving"):
+        for key, count in other.counts.items():
+            self.add(key, count)
+
+    def top(self, k: int) -> List[tuple]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+class StatsBucket:
+    """Sketches for every log that arrived in one fixed-width time slot"""
+
+    __slots__ = ("start", "severity_counts", "hosts", "apps", "host_hll", "app_hll")
+
+    def __init__(self, start: int, capacity: int, precision: int):
+        self.start = start
+        self.severity_counts = [0] * len(SEVERITIES)
+        self.hosts = SpaceSaving(capacity)
+        self.apps = SpaceSaving(capacity)
+        self.host_hll = HyperLogLog(precision)
+        self.app_hll = HyperLogLog(precision)
+
+    def add(self, host: str, app: str, severity: str):
+        index = SEVERITY_INDEX.get(severity)
+        if index is not None:
+            self.severity_counts[index] += 1
+        self.hosts.add(host)
+        self.apps.add(app)
+        self.host_hll.add(host)
+        self.app_hll.add(app)
+
+    def merge(self, other: "StatsBucket"):
+        self.severity_counts = [a + b for a, b in zip(self.severity_counts, other.severity_counts)]
+        self.hosts.merge(other.hosts)
+        self.apps.merge(other.apps)
+        self.host_hll.merge(other.host_hll)
+        self.app_hll.merge(other.app_hll)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start": self.start,
+            "severity_counts": self.severity_counts,
+            "hosts": self.hosts.counts,
+            "apps": self.apps.counts,
+            "host_hll": base64.b64encode(self.host_hll.registers).decode(),
+            "app_hll": base64.b64encode(self.app_hll.registers).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], capacity: int, precision: int) -> "StatsBucket":
+        bucket = cls(data["start"], capacity, precision)
+        bucket.severity_counts = list(data["severity_counts"])
+        bucket.hosts = SpaceSaving(capacity, dict(data["hosts"]))
+        bucket.apps = SpaceSaving(capacity, dict(data["apps"]))
+        bucket.host_hll = HyperLogLog(precision, bytearray(base64.b64decode(data["host_hll"])))
+        bucket.app_hll = HyperLogLog(precision, bytearray(base64.b64decode(data["app_hll"])))
+        return bucket
+
+class BucketRing:
+    """Fixed-size ring of StatsBuckets covering ``width * size`` seconds"""
+
+    def __init__(self, width: int, size: int, capacity: int, precision: int):
+        self.width = width
+        self.size = size
+        self.capacity = capacity
+        self.precision = precision
+        self.buckets: List[Optional[StatsBucket]] = [None] * size
+
+    def bucket_for(self, now: float) -> StatsBucket:
+        start = int(now) // self.width * self.width
+        slot = (start // self.width) % self.size
+        bucket = self.buckets[slot]
+        if bucket is None or bucket.start != start:
+            bucket = StatsBucket(start, self.capacity, self.precision)
+            self.buckets[slot] = bucket
+        return bucket
+
+    def window(self, now: float, seconds: int) -> StatsBucket:
+        """Merge every bucket overlapping the last ``seconds`` seconds"""
+        oldest = now - seconds - self.width
+        merged = StatsBucket(int(now) // self.width * self.width, self.capacity, self.precision)
+        for bucket in self.buckets:
+            if bucket is not None and oldest < bucket.start <= now:
+                merged.merge(bucket)
+                merged.start = min(merged.start, bucket.start)
+        return merged
+
+    def to_list(self, now: float) -> List[Dict[str, Any]]:
+        oldest = now - self.width * self.size
+        return [bucket.to_dict() for bucket in self.buckets if bucket is not None and bucket.start > oldest]
+
+    def load(self, buckets: List[Dict[str, Any]], now: float):
+        oldest = now - self.width * self.size
+        for data in buckets:
+            if oldest < data["start"] <= now:
+                bucket = StatsBucket.from_dict(data, self.capacity, self.precision)
+                self.buckets[(bucket.start // self.width) % self.size] = bucket
+
+class LiveStats:
+    """Sliding-window log statistics fed by the new_log notification stream.
+
+    Minute buckets serve the 1m, 15m and 1h windows and hour buckets serve
+    the 24h window. Windows are resolved at bucket granularity, so a window
+    covers at most one extra bucket; the reported ``window_start`` says how
+    far back it actually reaches.
+    """
+
+    def __init__(self, capacity: int, precision: int):
+        self.minutes = BucketRing(60, 60, capacity, precision)
+        self.hours = BucketRing(3600, 24, capacity, precision)
+        self.dropped = 0
+
+    def add(self, host: str, app: str, severity: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.minutes.bucket_for(now).add(host, app, severity)
+        self.hours.bucket_for(now).add(host, app, severity)
+
+    def on_new_log(self, payload: str):
+        try:
+            log = json.loads(payload)
+            self.add(log["host"], log["app"], log["severity"])
+        except (ValueError, KeyError, TypeError):
+            self.dropped += 1
+
+    def snapshot(self, window: str, top: int = 10) -> Dict[str, Any]:
+        now = time.time()
+        seconds = WINDOWS[window]
+        ring = self.hours if seconds > self.minutes.width * self.minutes.size else self.minutes
+        merged = ring.window(now, seconds)
+        return {
+            "window": window,
+            "window_start": merged.start,
+            "total_count": sum(merged.severity_counts),
+            "by_severity": [
+                {"severity": severity, "count": count}
+                for severity, count in zip(SEVERITIES, merged.severity_counts)
+                if count
+            ],
+            "by_host": [{"host": host, "count": count} for host, count in merged.hosts.top(top)],
+            "by_app": [{"app": app, "count": count} for app, count in merged.apps.top(top)],
+            "distinct_hosts": merged.host_hll.count(),
+            "distinct_apps": merged.app_hll.count(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        return {"minutes": self.minutes.to_list(now), "hours": self.hours.to_list(now)}
+
+    def load(self, state: Dict[str, Any]):
+        now = time.time()
+        self.minutes.load(state.get("minutes", []), now)
+        self.hours.load(state.get("hours", []), now)
+
+# Create a global instance of the live statistics
+live_stats = LiveStats(
+    capacity=int(os.environ.get("LIVE_STATS_TOP_CAPACITY", "64")),
+    precision=int(os.environ.get("LIVE_STATS_HLL_PRECISION", "10")),
+)
+
+# Every worker saves its own checkpoint row. Each worker counts the whole
+# new_log stream, so their sketches hold the same logs; a restart loads the
+# newest one rather than merging them, which would count logs twice.
+CHECKPOINT_PREFIX = "live_stats"
+CHECKPOINT_NAME = f"{CHECKPOINT_PREFIX}:{socket.gethostname()}:{os.getpid()}"
+CHECKPOINT_INTERVAL = int(os.environ.get("LIVE_STATS_CHECKPOINT_INTERVAL", "60"))
+
+_checkpoint_task = None
+
+async def save_checkpoint(conn=None):
+    from .. import db_pool
+    if conn is None:
+        async with db_pool.acquire() as conn:
+            return await save_checkpoint(conn)
+    await conn.execute(
+        """
+        INSERT INTO live_stats_checkpoints (name, saved_at, state)
+        VALUES ($1, NOW(), $2::jsonb)
+        ON CONFLICT (name) DO UPDATE SET saved_at = EXCLUDED.saved_at, state = EXCLUDED.state
+        """,
+        CHECKPOINT_NAME,
+        json.dumps(live_stats.to_dict()),
+    )
+    # Checkpoints of workers gone for longer than the widest window hold nothing current
+    await conn.execute(
+        """
+        DELETE FROM live_stats_checkpoints
+        WHERE name LIKE $1 || '%' AND saved_at < NOW() - make_interval(secs => $2)
+        """,
+        CHECKPOINT_PREFIX,
+        max(WINDOWS.values()),
+    )
+
+async def load_checkpoint():
+    from .. import db_pool
+    async with db_pool.acquire() as conn:
+        state = await conn.fetchval(
+            """
+            SELECT state FROM live_stats_checkpoints
+            WHERE name LIKE $1 || '%'
+            ORDER BY saved_at DESC
+            LIMIT 1
+            """,
+            CHECKPOINT_PREFIX,
+        )
+    if state:
+        live_stats.load(json.loads(state))
+
+async def checkpoint_loop():
+    while True:
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
+        try:
+            await save_checkpoint()
+        except Exception as e:
+            logger.error(f"Error saving live stats checkpoint: {str(e)}")
+
+# Function to start the live statistics
+async def start_live_stats():
+    global _checkpoint_task
+    try:
+        await load_checkpoint()
+    except Exception as e:
+        logger.error(f"Error loading live stats checkpoint: {str(e)}")
+    await notification_listener.subscribe("new_log", live_stats.on_new_log)
+    _checkpoint_task = asyncio.create_task(checkpoint_loop())
+
+# Function to stop the live statistics
+async def stop_live_stats():
+    global _checkpoint_task
+    if _checkpoint_task is None:
+        return
+    _checkpoint_task.cancel()
+    _checkpoint_task = None
+    # The pool is already closed at shutdown, so the final save opens its own connection
+    from .. import get_db_connection
+    try:
+        conn = await get_db_connection()
+        try:
+            await save_checkpoint(conn)
+        finally:
+            await conn.close()
+    except Exception as e:
+        logger.error(f"Error saving final live stats checkpoint: {str(e)}")
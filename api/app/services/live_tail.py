@@ -0,0 +1,156 @@
+import re
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Pattern, Tuple
+
+import orjson
+
+from scoring.severity import SEVERITY_INDEX
+
+from ..models import LogSubscription
+from .log_query import is_literal_pattern
+
+class TailFilter(NamedTuple):
+    """Compiled live tail subscription.
+
+    ``host`` and ``app`` are exact matches and are used to index subscribers;
+    the remaining fields are checked per event only for indexed candidates.
+    """
+    host: Optional[str] = None
+    app: Optional[str] = None
+    severities: Optional[FrozenSet[str]] = None
+    message: Optional[Pattern] = None
+    anomalies_only: bool = False
+
+    @property
+    def index_key(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.host, self.app
+
+    def accepts(self, log: Dict[str, Any]) -> bool:
+        """Check every constraint, including the indexed host and app"""
+        if self.host is not None and log.get("host") != self.host:
+            return False
+        if self.app is not None and log.get("app") != self.app:
+            return False
+        return self.matches(log)
+
+    def matches(self, log: Dict[str, Any]) -> bool:
+        if self.severities is not None and log.get("severity") not in self.severities:
+            return False
+        if self.message is not None:
+            msg = log.get("msg")
+            if not isinstance(msg, str) or self.message.search(msg) is None:
+                return False
+        return True
+
+def compile_subscription(subscription: LogSubscription) -> TailFilter:
+    """Compile a client subscription, raising ValueError if it is invalid"""
+    severities = None
+    if subscription.severity:
+        values = [subscription.severity] if isinstance(subscription.severity, str) else subscription.severity
+        severities = frozenset(value.lower() for value in values)
+        unknown = severities - SEVERITY_INDEX.keys()
+        if unknown:
+            raise ValueError(
+                f"Unsupported severity: {', '.join(sorted(unknown))}. Use one of: {', '.join(SEVERITY_INDEX)}"
+            )
+
+    message = None
+    if subscription.message:
+        # Case-insensitive, like ILIKE and ~* in /logs/search
+        pattern = subscription.message
+        if not subscription.use_regex or is_literal_pattern(pattern):
+            pattern = re.escape(pattern)
+        try:
+            message = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Invalid message pattern: {e}")
+
+    return TailFilter(
+        host=subscription.host or None,
+        app=subscription.app or None,
+        severities=severities,
+        message=message,
+        anomalies_only=subscription.anomalies_only,
+    )
+
+class SubscriberIndex:
+    """Subscribers bucketed by their exact (host, app) constraint.
+
+    An event is only tested against the four buckets it can possibly match:
+    (host, app), (host, any), (any, app) and (any, any). Subscribers with an
+    empty filter are tracked separately so that, while nobody filters, events
+    are passed through without being parsed at all.
+    """
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[Optional[str], Optional[str]], Dict[Hashable, TailFilter]] = defaultdict(dict)
+        self.filters: Dict[Hashable, TailFilter] = {}
+        self.unfiltered: Dict[Hashable, None] = {}
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+    def add(self, subscriber: Hashable, tail_filter: TailFilter):
+        self.remove(subscriber)
+        self.filters[subscriber] = tail_filter
+        if tail_filter == TailFilter(anomalies_only=tail_filter.anomalies_only):
+            self.unfiltered[subscriber] = None
+        else:
+            self.buckets[tail_filter.index_key][subscriber] = tail_filter
+
+    def remove(self, subscriber: Hashable):
+        tail_filter = self.filters.pop(subscriber, None)
+        if tail_filter is None:
+            return
+        if subscriber in self.unfiltered:
+            del self.unfiltered[subscriber]
+            return
+        bucket = self.buckets[tail_filter.index_key]
+        bucket.pop(subscriber, None)
+        if not bucket:
+            del self.buckets[tail_filter.index_key]
+
+    def match(self, payload: str) -> List[Hashable]:
+        """Return the filtered subscribers that accept a notification payload.
+
+        Unfiltered subscribers accept everything and are not included, so
+        callers can send them one shared batch.
+        """
+        matched = []
+        if not self.buckets:
+            return matched
+        try:
+            log = orjson.loads(payload)
+            host, app = log.get("host"), log.get("app")
+            keys = {(host, app), (host, None), (None, app), (None, None)}
+        except (orjson.JSONDecodeError, AttributeError, TypeError):
+            # Filtered subscribers never see payloads they cannot be tested against
+            return matched
+        for key in keys:
+            bucket = self.buckets.get(key)
+            if bucket:
+                matched.extend(subscriber for subscriber, tail_filter in bucket.items() if tail_filter.matches(log))
+        return matched
+
+class LiveTail:
+    """Routes live log notifications to the subscribers whose filter they match.
+
+    Logs are only scored for anomalies after they are ingested, so anomaly-only
+    subscriptions are fed from new_anomaly, everything else from new_log.
+    """
+
+    def __init__(self):
+        self.logs = SubscriberIndex()
+        self.anomalies = SubscriberIndex()
+
+    def subscribe(self, subscriber: Hashable, tail_filter: TailFilter = TailFilter()):
+        self.unsubscribe(subscriber)
+        index = self.anomalies if tail_filter.anomalies_only else self.logs
+        index.add(subscriber, tail_filter)
+
+    def filter_for(self, subscriber: Hashable) -> TailFilter:
+        return self.logs.filters.get(subscriber) or self.anomalies.filters.get(subscriber) or TailFilter()
+
+    def unsubscribe(self, subscriber: Hashable):
+        self.logs.remove(subscriber)
+        self.anomalies.remove(subscriber)
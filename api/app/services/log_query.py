@@ -0,0 +1,285 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from ..models import LogSearch
+
+# Text filter modes
+SUBSTRING = "substring"
+REGEX = "regex"
+TOKENS = "tokens"
+
+# Columns returned by log search and export queries
+LOG_COLUMNS = ["id", "ts", "host", "app", "severity", "msg", "is_anomaly", "anomaly_score"]
+
+# Characters that make a use_regex pattern more than a literal substring
+REGEX_METACHARACTERS = frozenset(".^$*+?()[]{}|\\")
+
+# Messages that can only be meant as web-search syntax: the whole message is
+# one quoted phrase, or bare terms joined by OR. Only these are read as token
+# queries when the search leaves full_text unset; anything else, such as a
+# pasted JSON fragment or a quote inside a longer message, stays a substring
+# search.
+TOKEN_QUERY_SYNTAX = re.compile(r'"[^"]*[^"\s][^"]*"|[^\s"]+(?: OR [^\s"]+)+')
+
+class TextFilter(NamedTuple):
+    mode: str
+    value: str
+
+class LogFilter(NamedTuple):
+    """Normalized, hashable form of a LogSearch.
+
+    Two searches that mean the same thing normalize to equal LogFilters, and
+    two LogFilters with the same shape always compile to the same SQL text.
+    Since asyncpg keeps an LRU cache of prepared statements per connection
+    keyed by SQL text, each shape is planned once per pooled connection and
+    then reused, no matter which values are bound.
+    """
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    host: Optional[TextFilter] = None
+    app: Optional[TextFilter] = None
+    severity: Optional[str] = None
+    message: Optional[TextFilter] = None
+
+    @property
+    def shape(self) -> Tuple:
+        """The parts of the filter that determine the compiled SQL text"""
+        return (
+            self.start_date is not None,
+            self.end_date is not None,
+            self.host.mode if self.host else None,
+            self.app.mode if self.app else None,
+            self.severity is not None,
+            self.message.mode if self.message else None,
+        )
+
+def is_literal_pattern(pattern: str) -> bool:
+    return not (set(pattern) & REGEX_METACHARACTERS)
+
+def is_token_query(message: str) -> bool:
+    return TOKEN_QUERY_SYNTAX.fullmatch(message.strip()) is not None
+
+def _text_filter(value: Optional[str], use_regex: bool) -> Optional[TextFilter]:
+    if not value:
+        return None
+    # A "regex" without metacharacters is a plain substring. ILIKE is cheaper
+    # to evaluate and lets pg_trgm extract every trigram from the pattern.
+    if use_regex and not is_literal_pattern(value):
+        return TextFilter(REGEX, value)
+    return TextFilter(SUBSTRING, value)
+
+def normalize_search(search: LogSearch) -> LogFilter:
+    """Turn a LogSearch request body into its normalized LogFilter"""
+    message = None
+    if search.message:
+        full_text = search.full_text
+        if full_text is None:
+            full_text = not search.use_regex and is_token_query(search.message)
+        if full_text:
+            message = TextFilter(TOKENS, search.message)
+        else:
+            message = _text_filter(search.message, search.use_regex)
+
+    return LogFilter(
+        start_date=search.start_date,
+        end_date=search.end_date,
+        host=_text_filter(search.host, search.use_regex),
+        app=_text_filter(search.app, search.use_regex),
+        severity=search.severity.lower() if search.severity else None,
+        message=message,
+    )
+
+def _like_pattern(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _text_condition(column: str, text: TextFilter, placeholder: str) -> Tuple[str, Any]:
+    if text.mode == REGEX:
+        return f"{column} ~* {placeholder}", text.value
+    if text.mode == TOKENS:
+        # Must use the same text search configuration as the msg_tsv column
+        return f"msg_tsv @@ websearch_to_tsquery('simple', {placeholder})", text.value
+    return f"{column} ILIKE {placeholder}", _like_pattern(text.value)
+
+def compile_where(
+    log_filter: LogFilter, start: int = 1, time_column: str = "ts"
+) -> Tuple[List[str], List[Any]]:
+    """Compile a LogFilter into WHERE conditions and their bind parameters.
+
+    Placeholders are numbered from ``start`` so callers can append their own
+    conditions (keyset bounds, LIMIT) after the filter's parameters.
+    ``time_column`` lets the same filter run against the rollup views, whose
+    time column is ``bucket``.
+    """
+    conditions = []
+    params = []
+
+    def placeholder() -> str:
+        return f"${start + len(params)}"
+
+    if log_filter.start_date:
+        conditions.append(f"{time_column} >= {placeholder()}")
+        params.append(log_filter.start_date)
+
+    if log_filter.end_date:
+        conditions.append(f"{time_column} <= {placeholder()}")
+        params.append(log_filter.end_date)
+
+    for column, text in (("host", log_filter.host), ("app", log_filter.app)):
+        if text:
+            condition, param = _text_condition(column, text, placeholder())
+            conditions.append(condition)
+            params.append(param)
+
+    if log_filter.severity:
+        conditions.append(f"severity = {placeholder()}")
+        params.append(log_filter.severity)
+
+    if log_filter.message:
+        condition, param = _text_condition("msg", log_filter.message, placeholder())
+        conditions.append(condition)
+        params.append(param)
+
+    return conditions, params
+
+def build_search_query(
+    log_filter: LogFilter,
+    limit: int,
+    after: Optional[Tuple[datetime, Any]] = None,
+) -> Tuple[str, List[Any]]:
+    """Build one keyset page of a log search, newest first.
+
+    ``after`` is the (ts, id) of the last row of the previous page. The bare
+    "ts <= $n" bound keeps each page a range scan on idx_logs_ts; the id
+    comparison only breaks ties between rows sharing a timestamp.
+    """
+    conditions, params = compile_where(log_filter)
+
+    if after:
+        ts_index = len(params) + 1
+        conditions.append(f"ts <= ${ts_index} AND (ts < ${ts_index} OR id < ${ts_index + 1})")
+        params.extend(after)
+
+    params.append(limit)
+    where_clause = " AND ".join(conditions) if conditions else "TRUE"
+
+    query = f"""
+        SELECT {", ".join(LOG_COLUMNS)}
+        FROM logs
+        WHERE {where_clause}
+        ORDER BY ts DESC, id DESC
+        LIMIT ${len(params)}
+    """
+    return query, params
+
+def build_export_query(log_filter: LogFilter) -> Tuple[str, List[Any]]:
+    """Build the unbounded, newest-first query used by streaming exports"""
+    conditions, params = compile_where(log_filter)
+    where_clause = " AND ".join(conditions) if conditions else "TRUE"
+
+    query = f"""
+        SELECT {", ".join(LOG_COLUMNS)}
+        FROM logs
+        WHERE {where_clause}
+        ORDER BY ts DESC
+    """
+    return query, params
+
+# Histogram bucket widths, smallest first. Widths are snapped up to one of
+# these so buckets line up with the rollup views whenever possible.
+HISTOGRAM_WIDTHS = [
+    timedelta(seconds=seconds)
+    for seconds in (
+        1, 5, 10, 30,
+        60, 120, 300, 600, 900, 1800,
+        3600, 7200, 10800, 21600, 43200,
+        86400, 172800, 604800,
+    )
+]
+
+# Rollup views by bucket size, coarsest first
+ROLLUP_SOURCES = [(timedelta(hours=1), "logs_1h"), (timedelta(minutes=1), "logs_1m")]
+
+# Columns a histogram can be split by; all of them exist in the rollups
+HISTOGRAM_GROUPS = ("severity", "host", "app")
+
+def _floor_time(value: datetime, size: timedelta) -> datetime:
+    epoch = datetime(1970, 1, 1, tzinfo=value.tzinfo)
+    return value - (value - epoch) % size
+
+def choose_bucket_width(start: datetime, end: datetime, target_buckets: int) -> timedelta:
+    """Pick the smallest standard width giving at most ``target_buckets`` buckets"""
+    ideal = (end - start) / max(target_buckets, 1)
+    for width in HISTOGRAM_WIDTHS:
+        if width >= ideal:
+            return width
+    return HISTOGRAM_WIDTHS[-1]
+
+def choose_histogram_source(log_filter: LogFilter, width: timedelta) -> Tuple[str, str, str]:
+    """Return (relation, time column, count expression) for a histogram.
+
+    Rollups carry severity, host and app, so only message filters and widths
+    finer than a rollup bucket need the raw hypertable.
+    """
+    if log_filter.message is None:
+        for size, view in ROLLUP_SOURCES:
+            if width >= size and width % size == timedelta(0):
+                return view, "bucket", "SUM(count)::bigint"
+    return "logs", "ts", "COUNT(*)"
+
+def build_histogram_query(
+    log_filter: LogFilter,
+    width: timedelta,
+    group_by: Optional[str] = None,
+    max_series: int = 10,
+) -> Tuple[str, List[Any], str]:
+    """Build a gap-filled volume histogram over the filter's time range.
+
+    The filter must have both start_date and end_date set. When grouping by
+    a column, only the ``max_series`` largest values get their own series
+    and the rest are summed into "other". Returns (query, params, source).
+    """
+    source, time_column, count_expression = choose_histogram_source(log_filter, width)
+    if source != "logs":
+        # Include the rollup bucket that contains start_date
+        size = next(size for size, view in ROLLUP_SOURCES if view == source)
+        log_filter = log_filter._replace(start_date=_floor_time(log_filter.start_date, size))
+    conditions, params = compile_where(log_filter, time_column=time_column)
+    where_clause = " AND ".join(conditions)
+
+    params.append(width)
+    width_placeholder = f"${len(params)}"
+    # time_bucket_gapfill takes its range from the filter's own bounds
+    gapfill = f"time_bucket_gapfill({width_placeholder}::interval, {time_column}, $1, $2)"
+
+    if group_by is None:
+        query = f"""
+            SELECT {gapfill} AS bucket, COALESCE({count_expression}, 0) AS count
+            FROM {source}
+            WHERE {where_clause}
+            GROUP BY 1
+            ORDER BY 1
+        """
+        return query, params, source
+
+    params.append(max_series)
+    query = f"""
+        WITH series AS (
+            SELECT {group_by}
+            FROM {source}
+            WHERE {where_clause}
+            GROUP BY {group_by}
+            ORDER BY {count_expression} DESC
+            LIMIT ${len(params)}
+        )
+        SELECT
+            {gapfill} AS bucket,
+            CASE WHEN {group_by} IN (SELECT {group_by} FROM series) THEN {group_by} ELSE 'other' END AS {group_by},
+            COALESCE({count_expression}, 0) AS count
+        FROM {source}
+        WHERE {where_clause}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """
+    return query, params, source
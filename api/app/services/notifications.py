@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import orjson
+
+from .. import get_db_connection
+
+logger = logging.getLogger("notifications")
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+
+def pack_payloads(items: List[bytes], limit: int = NOTIFY_PAYLOAD_LIMIT) -> List[str]:
+    """Pack JSON-encoded events into as few JSON array payloads as fit under ``limit`` bytes.
+
+    The listener unpacks array payloads, so subscribers still receive one
+    event per callback. An event that does not fit on its own is sent alone
+    and left for PostgreSQL to reject.
+    """
+    payloads = []
+    batch: List[bytes] = []
+    size = 2
+    for item in items:
+        if batch and size + len(item) + 1 > limit:
+            payloads.append(b"[" + b",".join(batch) + b"]")
+            batch, size = [], 2
+        batch.append(item)
+        size += len(item) + 1
+    if batch:
+        payloads.append(b"[" + b",".join(batch) + b"]")
+    return [payload.decode() for payload in payloads]
+
+# Backoff between reconnect attempts, in seconds
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = float(os.environ.get("NOTIFY_RECONNECT_MAX_DELAY", "30"))
+
+class NotificationListener:
+    """Process-wide hub for PostgreSQL notifications.
+
+    A single dedicated LISTEN connection, separate from the query pool,
+    receives every channel and fans payloads out to the registered
+    callbacks: caches, live statistics and WebSocket subscribers alike. The
+    number of consumers never affects pool capacity. If the connection
+    drops it is re-established with exponential backoff and every channel
+    is listened to again.
+
+    Notifications sent while no connection is listening are lost, so after
+    every (re)connection the listener calls the ``subscribe_connect``
+    callbacks; consumers that hold notified state drop or resync it there.
+
+    Callbacks run synchronously on the event loop for every payload, so
+    they must be cheap and never block.
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.is_running = False
+        self.callbacks: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self.connect_callbacks: List[Callable[[], None]] = []
+        self.reconnects = 0
+        self._connect_task = None
+
+    async def subscribe(self, channel: str, callback: Callable[[str], None]):
+        is_new_channel = not self.callbacks[channel]
+        self.callbacks[channel].append(callback)
+        if self.conn is not None and is_new_channel:
+            await self.conn.add_listener(channel, self._dispatch)
+
+    def subscribe_connect(self, callback: Callable[[], None]):
+        """Call ``callback()`` after every connection, once all channels are listened to"""
+        self.connect_callbacks.append(callback)
+
+    async def start(self):
+        self.is_running = True
+        # Connect in the background so a database outage does not block startup
+        self._connect_task = asyncio.create_task(self._connect())
+
+    async def stop(self):
+        self.is_running = False
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+            self._connect_task = None
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            await conn.close()
+
+    async def _connect(self):
+        delay = RECONNECT_MIN_DELAY
+        while self.is_running:
+            conn = None
+            try:
+                conn = await get_db_connection()
+                conn.add_termination_listener(self._on_terminated)
+                # Channels subscribed while this runs are picked up by the next pass
+                listening = set()
+                while set(self.callbacks) - listening:
+                    for channel in set(self.callbacks) - listening:
+                        await conn.add_listener(channel, self._dispatch)
+                        listening.add(channel)
+                if conn.is_closed():
+                    raise ConnectionError("connection closed while listening")
+                # Nothing is awaited from here on, so a termination is seen as self.conn's
+                self.conn = conn
+                logger.info(f"Listening for notifications on: {', '.join(self.callbacks)}")
+                self._notify_connected()
+                return
+            except Exception as e:
+                if conn is not None:
+                    conn.terminate()
+                logger.error(f"Error connecting notification listener, retrying in {delay:g}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _notify_connected(self):
+        for callback in self.connect_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error handling notification listener connect: {str(e)}")
+
+    def _on_terminated(self, conn):
+        # Connections lost before they were handed to self.conn are retried by _connect
+        if not self.is_running or conn is not self.conn:
+            return
+        self.conn = None
+        self.reconnects += 1
+        logger.warning("Notification listener connection lost, reconnecting")
+        self._connect_task = asyncio.create_task(self._connect())
+
+    def _dispatch(self, conn, pid, channel, payload):
+        payloads = [payload]
+        if payload.startswith("["):
+            # A batch from pack_payloads; subscribers get its events one by one
+            try:
+                payloads = [orjson.dumps(event).decode() for event in orjson.loads(payload)]
+            except orjson.JSONDecodeError:
+                pass
+        for callback in self.callbacks[channel]:
+            for event in payloads:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Error handling {channel} notification: {str(e)}")
+
+# Create a global instance of the notification listener
+notification_listener = NotificationListener()
+
+# Function to start the notification listener
+async def start_notification_listener():
+    await notification_listener.start()
+
+# Function to stop the notification listener
+async def stop_notification_listener():
+    await notification_listener.stop()
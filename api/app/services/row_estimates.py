@@ -0,0 +1,83 @@
+import json
+import math
+import os
+from typing import Any, Dict
+
+from .log_query import LogFilter, compile_where
+
+# Count modes accepted by the endpoints
+COUNT_MODES = ("exact", "approximate")
+
+# Below this planner estimate an exact count is cheap enough to just run
+EXACT_COUNT_THRESHOLD = int(os.environ.get("EXACT_COUNT_THRESHOLD", "50000"))
+# Percentage of table blocks read by a TABLESAMPLE SYSTEM count
+SAMPLE_PERCENT = float(os.environ.get("COUNT_SAMPLE_PERCENT", "1"))
+
+def _estimate(count: float, method: str, error: float = 0.0, exact: bool = False) -> Dict[str, Any]:
+    return {"count": int(round(count)), "exact": exact, "method": method, "error": int(math.ceil(error))}
+
+async def exact_count(conn, log_filter: LogFilter) -> Dict[str, Any]:
+    conditions, params = compile_where(log_filter)
+    where_clause = " AND ".join(conditions) if conditions else "TRUE"
+    count = await conn.fetchval(f"SELECT COUNT(*) FROM logs WHERE {where_clause}", *params)
+    return _estimate(count, "exact", exact=True)
+
+async def approximate_total(conn) -> Dict[str, Any]:
+    """Row count of the whole logs hypertable from TimescaleDB chunk statistics"""
+    count = await conn.fetchval("SELECT approximate_row_count('logs')")
+    return _estimate(count, "chunk_statistics")
+
+async def approximate_anomaly_count(conn, total: int) -> Dict[str, Any]:
+    """Estimate anomalies from the planner's is_anomaly value frequencies.
+
+    Falls back to the hourly rollup when the hypertable has not been analyzed.
+    """
+    frequency = await conn.fetchval("""
+        SELECT freq
+        FROM pg_stats,
+            unnest(most_common_vals::text::boolean[], most_common_freqs) AS mcv(val, freq)
+        WHERE tablename = 'logs' AND attname = 'is_anomaly' AND mcv.val
+        ORDER BY inherited DESC
+        LIMIT 1
+    """)
+    if frequency is not None:
+        return _estimate(total * frequency, "column_statistics")
+    count = await conn.fetchval("SELECT COALESCE(SUM(count), 0) FROM logs_1h WHERE is_anomaly")
+    return _estimate(count, "rollup", exact=True)
+
+async def approximate_count(conn, log_filter: LogFilter) -> Dict[str, Any]:
+    """Estimate how many logs match a filter without scanning all of them.
+
+    An unfiltered count comes from chunk statistics. Otherwise the planner
+    estimates the match count first. Small results are simply counted
+    exactly. Large ones are counted on a TABLESAMPLE SYSTEM sample and scaled
+    up. The reported error is a 95% bound that assumes matches are spread
+    evenly across blocks.
+    """
+    if log_filter == LogFilter():
+        return await approximate_total(conn)
+
+    conditions, params = compile_where(log_filter)
+    where_clause = " AND ".join(conditions)
+
+    plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM logs WHERE {where_clause}", *params)
+    planned = json.loads(plan)[0]["Plan"]["Plan Rows"]
+    if planned < EXACT_COUNT_THRESHOLD:
+        return await exact_count(conn, log_filter)
+
+    params.append(SAMPLE_PERCENT)
+    sampled = await conn.fetchval(
+        f"SELECT COUNT(*) FROM logs TABLESAMPLE SYSTEM (${len(params)}) WHERE {where_clause}",
+        *params,
+    )
+    if not sampled:
+        # Nothing landed in the sample, the planner's estimate is all we have
+        return _estimate(planned, "planner")
+
+    scale = 100.0 / SAMPLE_PERCENT
+    return _estimate(sampled * scale, "sample", error=1.96 * math.sqrt(sampled) * scale)
+
+async def count_logs(conn, log_filter: LogFilter, mode: str) -> Dict[str, Any]:
+    if mode == "exact":
+        return await exact_count(conn, log_filter)
+    return await approximate_count(conn, log_filter)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from scoring.anomaly_scoring import AnomalyScorer
+from scoring.worker import encode_batch, init_process, score_encoded
+
+logger = logging.getLogger("scoring_executor")
+
+# Where anomaly scoring runs
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+EXECUTOR_KINDS = (INLINE, THREAD, PROCESS)
+EXECUTOR_KIND = os.environ.get("ANOMALY_SCORING_EXECUTOR", THREAD)
+if EXECUTOR_KIND not in EXECUTOR_KINDS:
+    logger.warning(f"Unsupported ANOMALY_SCORING_EXECUTOR: {EXECUTOR_KIND}. Using {THREAD}")
+    EXECUTOR_KIND = THREAD
+
+# Worker threads or processes scoring batches
+WORKERS = int(os.environ.get("ANOMALY_SCORING_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Batches submitted at once; further batches wait for a slot
+MAX_IN_FLIGHT = int(os.environ.get("ANOMALY_SCORING_MAX_IN_FLIGHT", "4"))
+
+class ScoringExecutor:
+    """Runs anomaly scoring inline, on a thread pool or on a process pool.
+
+    Inline scoring runs on the event loop and suits small deployments.
+    Threads keep a long batch from stalling the loop, though they still
+    share the GIL with it. Processes take scoring off the API process
+    entirely: each batch travels as one Arrow IPC buffer and every worker
+    holds its own copy of the scorer. At most ``max_in_flight`` batches are
+    submitted at once; callers beyond that wait, which in turn holds back
+    the detector.
+    """
+
+    def __init__(
+        self,
+        scorer: AnomalyScorer,
+        kind: str = EXECUTOR_KIND,
+        workers: int = WORKERS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+    ):
+        self.scorer = scorer
+        self.kind = kind
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.executor: Optional[Executor] = None
+        self.in_flight = 0
+        self.batches = 0
+        self.waited = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self.kind == THREAD:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="anomaly-scoring")
+        elif self.kind == PROCESS:
+            self.executor = self._process_pool()
+        workers = f" with {self.workers} workers" if self.executor is not None else ""
+        logger.info(f"Scoring anomalies {self.kind}{workers}")
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked, so workers do not inherit the event
+        # loop, open sockets or the threads of the API process
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_process,
+            initargs=(self.scorer,),
+        )
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def score_logs(self, logs: Sequence) -> List[float]:
+        """Score a batch of logs, in order"""
+        severities = [log["severity"] for log in logs]
+        messages = [log["msg"] for log in logs]
+        if self.executor is None:
+            return self.scorer.score(severities, messages).tolist()
+
+        if self._slots.locked():
+            self.waited += 1
+        async with self._slots:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                return (await self._submit(severities, messages)).tolist()
+            finally:
+                self.in_flight -= 1
+                self.busy_seconds += time.perf_counter() - started
+                self.batches += 1
+
+    async def _submit(self, severities: List[str], messages: List[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        if self.kind == THREAD:
+            return await loop.run_in_executor(executor, self.scorer.score, severities, messages)
+        try:
+            data = encode_batch(severities, messages)
+            return await loop.run_in_executor(executor, score_encoded, data)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next batches and let
+            # this one fail, to be picked up again by the detector
+            if self.executor is executor:
+                logger.error("Anomaly scoring process pool broke, restarting it")
+                self.restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._process_pool()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers if self.executor is not None else 0,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "batches": self.batches,
+            "waited": self.waited,
+            "restarts": self.restarts,
+            "busy_seconds": self.busy_seconds,
+        }
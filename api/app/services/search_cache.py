@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from .log_query import LogFilter
+from .notifications import notification_listener
+
+logger = logging.getLogger("search_cache")
+
+class CacheEntry(NamedTuple):
+    expires_at: float
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+    is_open: bool
+    value: Any
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # asyncpg binds naive datetimes to timestamptz as UTC, so compare them the same way
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _parse_ts(value: str) -> datetime:
+    # Ingest serializes JavaScript Dates with a trailing "Z"
+    return _as_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+class SearchCache:
+    """In-process LRU cache of /logs/search results with TTL expiry.
+
+    Searches whose time range reaches "now" are open: they get a short TTL
+    and are dropped on every new_log notification. Searches that ended more
+    than ``closed_grace`` ago are closed and kept for ``closed_ttl``. They
+    are only dropped when a late log arrives with a timestamp inside their
+    range, or when the anomaly detector scores logs inside it, which can
+    happen long after ingest.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, closed_ttl: float, closed_grace: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.closed_ttl = closed_ttl
+        self.closed_grace = timedelta(seconds=closed_grace)
+        self.entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.open_keys = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: Hashable, log_filter: LogFilter, value: Any):
+        end_date = _as_utc(log_filter.end_date)
+        is_open = end_date is None or end_date >= datetime.now(timezone.utc) - self.closed_grace
+        ttl = self.ttl if is_open else self.closed_ttl
+
+        self._remove(key)
+        self.entries[key] = CacheEntry(
+            expires_at=time.monotonic() + ttl,
+            start_date=_as_utc(log_filter.start_date),
+            end_date=end_date,
+            is_open=is_open,
+            value=value,
+        )
+        if is_open:
+            self.open_keys.add(key)
+
+        while len(self.entries) > self.max_entries:
+            evicted, _ = self.entries.popitem(last=False)
+            self.open_keys.discard(evicted)
+            self.evictions += 1
+
+    def invalidate_open(self):
+        for key in list(self.open_keys):
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_log(self, ts: datetime):
+        """Drop every cached search whose time range could include a log at ``ts``"""
+        self.invalidate_range(ts, ts)
+
+    def invalidate_range(self, start: datetime, end: datetime):
+        """Drop every cached search whose time range overlaps ``start``..``end``"""
+        self.invalidate_open()
+        # Closed entries all ended before now - grace, so newer logs cannot touch them
+        if start >= datetime.now(timezone.utc) - self.closed_grace:
+            return
+        for key, entry in list(self.entries.items()):
+            if (entry.start_date is None or entry.start_date <= end) and (
+                entry.end_date is None or start <= entry.end_date
+            ):
+                self._remove(key)
+                self.invalidations += 1
+
+    def on_new_log(self, payload: str):
+        """Invalidate entries for a new_log notification payload"""
+        if len(self.entries) == len(self.open_keys):
+            # Only open entries are cached, no need to decode the payload
+            self.invalidate_open()
+            return
+        try:
+            ts = _parse_ts(json.loads(payload)["ts"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Could not read ts from new_log payload, clearing search cache")
+            self.clear()
+            return
+        self.invalidate_log(ts)
+
+    def on_logs_scored(self, payload: str):
+        """Invalidate entries whose logs the anomaly detector just scored"""
+        if len(self.entries) == len(self.open_keys):
+            self.invalidate_open()
+            return
+        try:
+            scored = json.loads(payload)
+            start, end = _parse_ts(scored["start"]), _parse_ts(scored["end"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Could not read the range of a logs_scored payload, clearing search cache")
+            self.clear()
+            return
+        self.invalidate_range(start, end)
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.open_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "open_entries": len(self.open_keys),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable):
+        self.entries.pop(key, None)
+        self.open_keys.discard(key)
+
+# Create a global instance of the search cache
+search_cache = SearchCache(
+    max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", "512")),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", "30")),
+    closed_ttl=float(os.environ.get("SEARCH_CACHE_CLOSED_TTL", "3600")),
+    closed_grace=float(os.environ.get("SEARCH_CACHE_CLOSED_GRACE", "300")),
+)
+
+# Function to start invalidating the search cache from new_log and logs_scored notifications
+async def start_search_cache():
+    await notification_listener.subscribe("new_log", search_cache.on_new_log)
+    await notification_listener.subscribe("logs_scored", search_cache.on_logs_scored)
+    # Invalidations sent while the listener was disconnected are lost
+    notification_listener.subscribe_connect(search_cache.clear)
+
+# Function to stop the search cache
+async def stop_search_cache():
+    search_cache.clear()
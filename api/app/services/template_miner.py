@@ -0,0 +1,277 @@
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("template_miner")
+
+WILDCARD = "<*>"
+
+_IPV6_GROUPS = r"[0-9a-fA-F]{1,4}(?::[0-9a-fA-F]{1,4}){0,6}"
+
+# Variable parts of a message, masked before template mining. Order matters:
+# timestamps, UUIDs and IPs must be masked before their digits are seen as
+# plain numbers, and clock times before IPv6 addresses.
+MASKS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2}\b)?"), "<TS>"),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<TIME>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?\b"), "<IP>"),
+    # IPv6: eight full groups, or "::" compression with at least one group
+    (re.compile(
+        r"(?<![\w:])(?:(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}"
+        rf"|(?=[0-9a-fA-F:]*[0-9a-fA-F])(?:{_IPV6_GROUPS})?::(?:{_IPV6_GROUPS})?)(?![\w:])"
+    ), "<IP>"),
+    (re.compile(r"\b0[xX][0-9a-fA-F]+\b|\b(?=[a-fA-F]*\d)[0-9a-fA-F]{8,}\b"), "<HEX>"),
+    (re.compile(r"(?<![\w.])(?:/[\w.\-]+)+/?"), "<PATH>"),
+    (re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.])"), "<NUM>"),
+]
+
+def mask_message(msg: str) -> str:
+    for pattern, replacement in MASKS:
+        msg = pattern.sub(replacement, msg)
+    return msg
+
+def _has_digits(token: str) -> bool:
+    return any(char.isdigit() for char in token)
+
+class LogCluster:
+    """One mined template. ``id`` stays None until the template is persisted."""
+
+    __slots__ = ("id", "tokens", "count", "changed")
+
+    def __init__(self, tokens: List[str], template_id: Optional[int] = None, count: int = 0):
+        self.id = template_id
+        self.tokens = tokens
+        self.count = count
+        self.changed = False
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+class TemplateMiner:
+    """Incremental Drain-style log template miner.
+
+    Messages are masked and tokenized, then routed through a fixed-depth
+    parse tree: first by token count, then by their leading tokens. At the
+    leaf the most similar cluster absorbs the message if at least
+    ``similarity`` of its tokens match; positions that differ become
+    wildcards. Otherwise the message starts a new cluster.
+
+    Every API process runs its own miner over the shared log_templates
+    table. Templates are upserted by their text, so two processes mining
+    the same template end up with the same id, and templates persisted by
+    other processes are loaded into the tree every ``reload_interval``
+    seconds.
+    """
+
+    def __init__(
+        self, depth: int = 4, similarity: float = 0.4, max_children: int = 100, reload_interval: float = 30
+    ):
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.reload_interval = reload_interval
+        self.root: Dict[int, dict] = {}
+        self.clusters: List[LogCluster] = []
+        self.loaded = False
+        # Highest persisted template id in the tree, and when the table was last read
+        self.last_id = 0
+        self.reloaded_at = 0.0
+        # Hourly occurrence counts per cluster, accumulated until the next flush
+        self.pending_counts: Dict[Tuple[LogCluster, datetime], int] = defaultdict(int)
+
+    def add(self, msg: str) -> LogCluster:
+        """Mine one message and return the cluster it was assigned to.
+
+        Occurrences are not counted here, so messages can be mined before it
+        is known whether their logs get scored; see ``count``.
+        """
+        tokens = mask_message(msg).split()
+        cluster = self._match(tokens)
+        if cluster is None:
+            cluster = LogCluster(tokens)
+            self._insert(cluster)
+        else:
+            merged = [a if a == b else WILDCARD for a, b in zip(cluster.tokens, tokens)]
+            if merged != cluster.tokens:
+                cluster.tokens = merged
+                cluster.changed = True
+        return cluster
+
+    def count(self, cluster: LogCluster, ts: datetime):
+        """Count one occurrence of a mined cluster, persisted by the next flush"""
+        cluster.count += 1
+        self.pending_counts[(cluster, ts.replace(minute=0, second=0, microsecond=0))] += 1
+
+    def _route(self, tokens: List[str], create: bool) -> Optional[list]:
+        node = self.root.get(len(tokens))
+        if node is None:
+            if not create:
+                return None
+            node = self.root[len(tokens)] = {}
+        # depth counts the length and leaf levels, the rest route on leading tokens
+        prefix = tokens[:max(self.depth - 2, 0)]
+        for position, token in enumerate(prefix):
+            is_last = position == len(prefix) - 1
+            key = WILDCARD if _has_digits(token) or token.startswith("<") else token
+            if key not in node:
+                if not create:
+                    key = WILDCARD
+                elif len(node) >= self.max_children:
+                    key = WILDCARD
+            if key not in node:
+                if not create:
+                    return None
+                node[key] = [] if is_last else {}
+            node = node[key]
+        if not prefix:
+            # Messages too short to route on tokens share one leaf per length
+            return node.setdefault(WILDCARD, [])
+        return node
+
+    def _match(self, tokens: List[str]) -> Optional[LogCluster]:
+        leaf = self._route(tokens, create=False)
+        if not leaf:
+            return None
+        best, best_similarity, best_wildcards = None, -1.0, -1
+        for cluster in leaf:
+            same = 0
+            wildcards = 0
+            for template_token, token in zip(cluster.tokens, tokens):
+                if template_token == WILDCARD:
+                    wildcards += 1
+                elif template_token == token:
+                    same += 1
+            similarity = same / len(tokens) if tokens else 1.0
+            if similarity > best_similarity or (similarity == best_similarity and wildcards > best_wildcards):
+                best, best_similarity, best_wildcards = cluster, similarity, wildcards
+        if best is not None and best_similarity >= self.similarity:
+            return best
+        return None
+
+    def _insert(self, cluster: LogCluster):
+        self._route(cluster.tokens, create=True).append(cluster)
+        self.clusters.append(cluster)
+
+    async def ensure_loaded(self, conn):
+        """Load persisted templates into the parse tree.
+
+        The first call loads them all; later calls only add templates that
+        other processes persisted since, at most every ``reload_interval``.
+        """
+        if self.loaded and time.monotonic() - self.reloaded_at < self.reload_interval:
+            return
+        rows = await conn.fetch(
+            "SELECT id, template, count FROM log_templates WHERE id > $1 ORDER BY id", self.last_id
+        )
+        known = {cluster.id for cluster in self.clusters}
+        added = 0
+        for row in rows:
+            if row["id"] not in known:
+                self._insert(LogCluster(row["template"].split(), row["id"], row["count"]))
+                added += 1
+            self.last_id = row["id"]
+        self.reloaded_at = time.monotonic()
+        if not self.loaded:
+            self.loaded = True
+            logger.info(f"Loaded {added} log templates")
+        elif added:
+            logger.info(f"Loaded {added} log templates mined by other processes")
+
+    async def flush(self, conn):
+        """Persist new and changed templates and the pending per-hour counts.
+
+        New templates get their ids here, so call this before writing
+        template ids back to the logs table. All new templates go out in one
+        upsert; one another process already persisted keeps that id.
+        """
+        new = [cluster for cluster in self.clusters if cluster.id is None]
+        if new:
+            # Clusters can converge on the same text, and an upsert may only touch a row once
+            templates = list(dict.fromkeys(cluster.template for cluster in new))
+            rows = await conn.fetch(
+                """
+                INSERT INTO log_templates (template)
+                SELECT * FROM unnest($1::text[])
+                ON CONFLICT ((md5(template))) DO UPDATE SET last_seen = EXCLUDED.last_seen
+                RETURNING id, template
+                """,
+                templates,
+            )
+            ids = {row["template"]: row["id"] for row in rows}
+            for cluster in new:
+                cluster.id = ids[cluster.template]
+                cluster.changed = False
+
+        changed = [cluster for cluster in self.clusters if cluster.changed]
+        if changed:
+            # A template generalized into one that is already persisted keeps its old text
+            await conn.execute(
+                """
+                UPDATE log_templates t
+                SET template = u.template
+                FROM (
+                    SELECT DISTINCT ON (md5(template)) id, template
+                    FROM unnest($1::bigint[], $2::text[]) AS c(id, template)
+                ) u
+                WHERE t.id = u.id
+                AND NOT EXISTS (SELECT 1 FROM log_templates o WHERE md5(o.template) = md5(u.template))
+                """,
+                [cluster.id for cluster in changed],
+                [cluster.template for cluster in changed],
+            )
+            for cluster in changed:
+                cluster.changed = False
+
+        if not self.pending_counts:
+            return
+        # Counts added while this flush awaits go to the next one
+        pending, self.pending_counts = self.pending_counts, defaultdict(int)
+        try:
+            # Clusters that converged on one template share its id, and an
+            # upsert may only touch each row once
+            totals: Dict[Tuple[int, datetime], int] = defaultdict(int)
+            for (cluster, bucket), count in pending.items():
+                totals[(cluster.id, bucket)] += count
+            ids, buckets, counts = zip(*((template_id, bucket, count) for (template_id, bucket), count in totals.items()))
+            # Both counters or neither, so a failed flush can be retried
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    INSERT INTO log_template_counts (template_id, bucket, count)
+                    SELECT * FROM unnest($1::bigint[], $2::timestamptz[], $3::bigint[])
+                    ON CONFLICT (template_id, bucket)
+                    DO UPDATE SET count = log_template_counts.count + EXCLUDED.count
+                    """,
+                    list(ids), list(buckets), list(counts),
+                )
+                await conn.execute(
+                    """
+                    UPDATE log_templates t
+                    SET count = t.count + u.count, last_seen = CURRENT_TIMESTAMP
+                    FROM (
+                        SELECT id, SUM(count) AS count
+                        FROM unnest($1::bigint[], $2::bigint[]) AS c(id, count)
+                        GROUP BY id
+                    ) u
+                    WHERE t.id = u.id
+                    """,
+                    list(ids), list(counts),
+                )
+        except Exception:
+            for key, count in pending.items():
+                self.pending_counts[key] += count
+            raise
+
+# Create a global instance of the template miner
+template_miner = TemplateMiner(
+    depth=int(os.environ.get("TEMPLATE_MINER_DEPTH", "4")),
+    similarity=float(os.environ.get("TEMPLATE_MINER_SIMILARITY", "0.4")),
+    max_children=int(os.environ.get("TEMPLATE_MINER_MAX_CHILDREN", "100")),
+    reload_interval=float(os.environ.get("TEMPLATE_MINER_RELOAD_INTERVAL", "30")),
+)
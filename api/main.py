@@ -7,20 +7,38 @@ import asyncio
 from app import app
 
 # Import all routes
-from app.routes import auth, logs, alerts, common, anomalies
+from app.routes import auth, logs, alerts, common, anomalies, dashboard
 
 # Import anomaly detector service
 from app.services.anomaly_detector import start_anomaly_detector, stop_anomaly_detector
 
+# Import notification consumers
+from app.services.notifications import start_notification_listener, stop_notification_listener
+from app.services.search_cache import start_search_cache, stop_search_cache
+from app.services.live_stats import start_live_stats, stop_live_stats
+from app.auth import start_user_cache, stop_user_cache
+from app.routes.logs import start_websocket_fanout, stop_websocket_fanout
+
 # Start and stop anomaly detector with app lifecycle
 @app.on_event("startup")
 async def startup_event():
     # Start anomaly detector in background
     asyncio.create_task(start_anomaly_detector())
+    # Subscribe in-process consumers, then open the shared LISTEN connection
+    await start_search_cache()
+    await start_live_stats()
+    await start_user_cache()
+    await start_websocket_fanout()
+    await start_notification_listener()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     await stop_anomaly_detector()
+    await stop_notification_listener()
+    await stop_websocket_fanout()
+    await stop_live_stats()
+    await stop_search_cache()
+    await stop_user_cache()
 
 # Run the app with Uvicorn when this file is executed directly
 if __name__ == "__main__":
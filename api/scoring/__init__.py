@@ -0,0 +1,5 @@
+"""Anomaly scoring that runs in scoring worker processes.
+
+Kept outside the ``app`` package, so spawned workers import only this and
+its numeric dependencies, not the API.
+"""
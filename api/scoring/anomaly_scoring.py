@@ -0,0 +1,136 @@
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import ahocorasick
+import numpy as np
+
+from .severity import SEVERITIES, SEVERITY_INDEX
+
+# Weight added for each keyword found in a message, matched case-insensitively
+DEFAULT_KEYWORD_WEIGHTS = {
+    "error": 0.2,
+    "failed": 0.2,
+    "exception": 0.3,
+    "timeout": 0.25,
+    "critical": 0.3,
+    "crash": 0.35,
+    "unavailable": 0.3,
+    "refused": 0.25,
+    "denied": 0.2,
+    "exceeded": 0.2,
+    "overflow": 0.3,
+    "deadlock": 0.4,
+    "corrupt": 0.4,
+}
+
+# Weight added for a log's severity
+DEFAULT_SEVERITY_WEIGHTS = {
+    "emergency": 0.4,
+    "alert": 0.4,
+    "critical": 0.4,
+    "error": 0.3,
+    "warning": 0.1,
+}
+
+def _weights_from_env(name: str, default: Dict[str, float]) -> Dict[str, float]:
+    # A JSON object replaces the whole default table
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return {str(key): float(weight) for key, weight in json.loads(value).items()}
+
+class KeywordMatcher:
+    """Finds which of a fixed set of keywords occur in each message of a batch.
+
+    The keywords are compiled once into an Aho-Corasick automaton. A batch
+    is lowercased and joined into one string, and the automaton walks it in
+    a single pass. Match end offsets map back to message indices with a
+    binary search over the message boundaries. Overlapping and nested
+    keywords are all reported, so the result equals testing
+    ``keyword in message.lower()`` for every keyword and message.
+    """
+
+    # Joins messages; it cannot occur in a keyword, so no match spans two messages
+    SEPARATOR = "\x00"
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = list(keywords)
+        self.automaton = None
+        if self.keywords:
+            self.automaton = ahocorasick.Automaton()
+            for index, keyword in enumerate(self.keywords):
+                if not keyword or self.SEPARATOR in keyword:
+                    raise ValueError(f"Invalid anomaly keyword: {keyword!r}")
+                self.automaton.add_word(keyword, index)
+            self.automaton.make_automaton()
+
+    def match(self, messages: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (message index, keyword index) for every keyword found, each pair once"""
+        if self.automaton is None or not messages:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        lowered = [message.lower() for message in messages]
+        # Offsets are taken after lowercasing, which can change a message's length
+        lengths = np.fromiter((len(message) + 1 for message in lowered), dtype=np.intp, count=len(lowered))
+        starts = np.cumsum(lengths) - lengths
+        ends = []
+        keyword_ids = []
+        for end, keyword_id in self.automaton.iter(self.SEPARATOR.join(lowered)):
+            ends.append(end)
+            keyword_ids.append(keyword_id)
+        if not ends:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        message_ids = np.searchsorted(starts, np.array(ends, dtype=np.intp), side="right") - 1
+        pairs = np.unique(message_ids * len(self.keywords) + np.array(keyword_ids, dtype=np.intp))
+        return pairs // len(self.keywords), pairs % len(self.keywords)
+
+class AnomalyScorer:
+    """Rule-based anomaly scoring over whole batches.
+
+    A score is the severity weight plus the weights of every keyword found
+    in the message, capped at 1.0.
+    """
+
+    def __init__(
+        self,
+        keyword_weights: Optional[Dict[str, float]] = None,
+        severity_weights: Optional[Dict[str, float]] = None,
+    ):
+        keyword_weights = DEFAULT_KEYWORD_WEIGHTS if keyword_weights is None else keyword_weights
+        severity_weights = DEFAULT_SEVERITY_WEIGHTS if severity_weights is None else severity_weights
+        weights = {keyword.lower(): weight for keyword, weight in keyword_weights.items()}
+        self.keyword_table = weights
+        self.severity_table = dict(severity_weights)
+        self.matcher = KeywordMatcher(list(weights))
+        self.keyword_weights = list(weights.values())
+        # One slot per known severity plus a trailing zero for unknown ones
+        self.severity_weights = np.array(
+            [severity_weights.get(severity, 0.0) for severity in SEVERITIES] + [0.0]
+        )
+
+    def __reduce__(self):
+        # Rebuilt from its weight tables, so it can be sent to worker processes
+        return AnomalyScorer, (self.keyword_table, self.severity_table)
+
+    def score(self, severities: Sequence[str], messages: Sequence[str]) -> np.ndarray:
+        unknown = len(SEVERITIES)
+        severity_index = np.fromiter(
+            (SEVERITY_INDEX.get(severity, unknown) for severity in severities), dtype=np.intp, count=len(severities)
+        )
+        scores = self.severity_weights[severity_index]
+        message_ids, keyword_ids = self.matcher.match(messages)
+        if len(message_ids):
+            # Add one keyword at a time, in table order, so sums round exactly
+            # like adding them log by log and scores at the threshold agree
+            for keyword_id, weight in enumerate(self.keyword_weights):
+                scores[message_ids[keyword_ids == keyword_id]] += weight
+        return np.minimum(scores, 1.0)
+
+    def score_logs(self, logs: Sequence) -> List[float]:
+        return self.score([log["severity"] for log in logs], [log["msg"] for log in logs]).tolist()
+
+def scorer_from_env() -> AnomalyScorer:
+    return AnomalyScorer(
+        keyword_weights=_weights_from_env("ANOMALY_KEYWORD_WEIGHTS", DEFAULT_KEYWORD_WEIGHTS),
+        severity_weights=_weights_from_env("ANOMALY_SEVERITY_WEIGHTS", DEFAULT_SEVERITY_WEIGHTS),
+    )
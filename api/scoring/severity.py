@@ -0,0 +1,3 @@
+# Severity order matches the CHECK constraint on logs.severity
+SEVERITIES = ["emergency", "alert", "critical", "error", "warning", "notice", "info", "debug"]
+SEVERITY_INDEX = {severity: index for index, severity in enumerate(SEVERITIES)}
@@ -0,0 +1,32 @@
+from typing import Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+
+from .anomaly_scoring import AnomalyScorer
+
+BATCH_SCHEMA = pa.schema([("severity", pa.string()), ("msg", pa.large_string())])
+
+# The scorer of a worker process, set once by its initializer
+_process_scorer: Optional[AnomalyScorer] = None
+
+def init_process(scorer: AnomalyScorer):
+    global _process_scorer
+    _process_scorer = scorer
+
+def encode_batch(severities: Sequence[str], messages: Sequence[str]) -> bytes:
+    """Pack a batch into one Arrow IPC buffer, so it crosses to a worker as a single bytes object"""
+    batch = pa.record_batch(
+        [pa.array(severities, pa.string()), pa.array(messages, pa.large_string())], schema=BATCH_SCHEMA
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, BATCH_SCHEMA) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def score_encoded(data: bytes) -> np.ndarray:
+    batch = pa.ipc.open_stream(data).read_next_batch()
+    severities = batch.column(0).to_pylist()
+    # Nulls score as empty messages
+    messages = [msg or "" for msg in batch.column(1).to_pylist()]
+    return _process_scorer.score(severities, messages)
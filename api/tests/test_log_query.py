@@ -0,0 +1,27 @@
+import pytest
+
+from app.models import LogSearch
+from app.services.log_query import SUBSTRING, TOKENS, TextFilter, normalize_search
+
+@pytest.mark.parametrize("message", [
+    '"level":"error"',
+    'GET "/index.html"',
+    'user said "hi"',
+    "error -1",
+    "cache OR",
+])
+def test_quoted_fragments_stay_substring_searches(message):
+    assert normalize_search(LogSearch(message=message)).message == TextFilter(SUBSTRING, message)
+
+@pytest.mark.parametrize("message", [
+    '"connection refused"',
+    "timeout OR deadlock",
+    "timeout OR deadlock OR refused",
+])
+def test_whole_web_search_expressions_are_token_searches(message):
+    assert normalize_search(LogSearch(message=message)).message == TextFilter(TOKENS, message)
+
+def test_explicit_full_text_wins():
+    message = '"level":"error"'
+    assert normalize_search(LogSearch(message=message, full_text=True)).message.mode == TOKENS
+    assert normalize_search(LogSearch(message="timeout OR deadlock", full_text=False)).message.mode == SUBSTRING
@@ -0,0 +1,22 @@
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from scoring.anomaly_scoring import AnomalyScorer
+from scoring.worker import encode_batch, init_process, score_encoded
+
+def _api_modules():
+    return [name for name in sys.modules if name == "app" or name.startswith(("app.", "fastapi"))]
+
+def test_process_worker_scores_without_importing_the_api():
+    scorer = AnomalyScorer()
+    severities, messages = ["error", "info", "bogus"], ["request failed", None, "timeout"]
+    with ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_process,
+        initargs=(scorer,),
+    ) as pool:
+        scores = pool.submit(score_encoded, encode_batch(severities, messages)).result()
+        assert pool.submit(_api_modules).result() == []
+    assert scores.tolist() == scorer.score(severities, ["request failed", "", "timeout"]).tolist()
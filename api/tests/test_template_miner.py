@@ -0,0 +1,18 @@
+import pytest
+
+from app.services.template_miner import mask_message
+
+@pytest.mark.parametrize("message, masked", [
+    ("time 12:30:45 now", "time <TIME> now"),
+    ("done at 2024-01-05T12:30:45.123Z", "done at <TS>"),
+    ("from fe80::1 ok", "from <IP> ok"),
+    ("bind ::1 port", "bind <IP> port"),
+    ("peer 2001:db8:0:0:0:0:0:1 up", "peer <IP> up"),
+    ("peer 10.0.0.1:8080 up", "peer <IP> up"),
+])
+def test_mask_message(message, masked):
+    assert mask_message(message) == masked
+
+@pytest.mark.parametrize("message", ["std::vector", "key :: value"])
+def test_scope_separators_are_not_ipv6(message):
+    assert mask_message(message) == message
@@ -0,0 +1,16 @@
+-- Indexed text search for logs
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Token search: maintained tsvector over the message. The 'simple' configuration
+-- keeps identifiers, error codes and stop words intact and must match the
+-- configuration used by the API's full-text predicate.
+ALTER TABLE logs
+    ADD COLUMN IF NOT EXISTS msg_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', msg)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_logs_msg_tsv ON logs USING gin (msg_tsv);
+
+-- Substring (ILIKE '%x%') and regex (~*) filters are served by trigram indexes
+CREATE INDEX IF NOT EXISTS idx_logs_msg_trgm ON logs USING gin (msg gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_logs_host_trgm ON logs USING gin (host gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_logs_app_trgm ON logs USING gin (app gin_trgm_ops);
@@ -0,0 +1,49 @@
+-- Continuous aggregate rollups of log volume
+--
+-- logs_1m counts logs per minute by severity, host, app and anomaly flag, and
+-- logs_1h rolls logs_1m up to hours. Dashboard statistics read these instead
+-- of scanning the logs hypertable, so their cost grows with the number of
+-- buckets rather than the number of rows. Both views are real-time
+-- aggregates: buckets not yet materialized are computed from raw chunks.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS logs_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 minute', ts) AS bucket,
+    severity,
+    host,
+    app,
+    COALESCE(is_anomaly, false) AS is_anomaly,
+    COUNT(*) AS count
+FROM logs
+GROUP BY bucket, severity, host, app, COALESCE(is_anomaly, false)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS logs_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', bucket) AS bucket,
+    severity,
+    host,
+    app,
+    is_anomaly,
+    SUM(count)::BIGINT AS count
+FROM logs_1m
+GROUP BY time_bucket(INTERVAL '1 hour', bucket), severity, host, app, is_anomaly
+WITH NO DATA;
+
+-- The start offsets cover the window in which the anomaly detector still
+-- rewrites is_anomaly on recent rows. When it scores a backlog older than
+-- that, the detector refreshes both views over the backlog itself; keep
+-- ANOMALY_ROLLUP_POLICY_HOURS in line with the logs_1m start_offset.
+SELECT add_continuous_aggregate_policy('logs_1m',
+    start_offset => INTERVAL '2 hours',
+    end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute',
+    if_not_exists => TRUE);
+
+SELECT add_continuous_aggregate_policy('logs_1h',
+    start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
@@ -0,0 +1,7 @@
+-- Checkpoints of the API's in-memory live statistics sketches, so the
+-- sliding windows survive a restart
+CREATE TABLE IF NOT EXISTS live_stats_checkpoints (
+    name VARCHAR(255) PRIMARY KEY,
+    saved_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    state JSONB NOT NULL
+);
@@ -0,0 +1,26 @@
+-- Log templates mined by the API's Drain-style template miner
+CREATE TABLE IF NOT EXISTS log_templates (
+    id BIGSERIAL PRIMARY KEY,
+    template TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_seen TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- One row per template text, so miners in several API processes share ids.
+-- Hashed because templates can outgrow a btree index entry.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_log_templates_template ON log_templates(md5(template));
+
+-- Hourly occurrence counters per template, read by /logs/patterns
+CREATE TABLE IF NOT EXISTS log_template_counts (
+    template_id BIGINT NOT NULL REFERENCES log_templates(id),
+    bucket TIMESTAMPTZ NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (template_id, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_log_template_counts_bucket ON log_template_counts(bucket DESC);
+
+-- Template assigned to each log, used to fetch pattern examples
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS template_id BIGINT;
+CREATE INDEX IF NOT EXISTS idx_logs_template ON logs(template_id, ts DESC);
@@ -0,0 +1,26 @@
+-- Tell API processes to drop cached principals when a user changes.
+-- last_login is updated on every login, so only identity, role and
+-- credential changes notify.
+CREATE OR REPLACE FUNCTION notify_user_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('user_changed', OLD.username);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_changed ON users;
+CREATE TRIGGER users_changed
+    AFTER UPDATE OF username, role, email, password_hash ON users
+    FOR EACH ROW
+    WHEN (
+        (OLD.username, OLD.role, OLD.email, OLD.password_hash)
+        IS DISTINCT FROM (NEW.username, NEW.role, NEW.email, NEW.password_hash)
+    )
+    EXECUTE FUNCTION notify_user_changed();
+
+DROP TRIGGER IF EXISTS users_deleted ON users;
+CREATE TRIGGER users_deleted
+    AFTER DELETE ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_user_changed();
@@ -0,0 +1,13 @@
+-- Claim frontier of the API's anomaly detector: every log up to
+-- (last_ts, last_id), in (ts, id) order, has been scored or belongs to a
+-- chunk in anomaly_chunks
+CREATE TABLE IF NOT EXISTS anomaly_detector_state (
+    name TEXT PRIMARY KEY,
+    last_ts TIMESTAMPTZ NOT NULL,
+    last_id UUID NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Logs still waiting for a score. Stays small, and lets the detector find
+-- logs that arrived with a timestamp behind its watermark.
+CREATE INDEX IF NOT EXISTS idx_logs_unscored ON logs(ts) WHERE anomaly_score IS NULL;
@@ -0,0 +1,15 @@
+-- Chunks of the log stream leased by anomaly detector instances. A chunk
+-- covers the logs after (start_ts, start_id) up to and including
+-- (end_ts, end_id). Its row is deleted in the transaction that writes its
+-- scores; a chunk whose lease expired is taken over by another instance.
+CREATE TABLE IF NOT EXISTS anomaly_chunks (
+    id BIGSERIAL PRIMARY KEY,
+    start_ts TIMESTAMPTZ NOT NULL,
+    start_id UUID NOT NULL,
+    end_ts TIMESTAMPTZ NOT NULL,
+    end_id UUID NOT NULL,
+    claimed_by TEXT NOT NULL,
+    lease_until TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_anomaly_chunks_lease ON anomaly_chunks(lease_until);
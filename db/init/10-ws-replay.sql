@@ -0,0 +1,12 @@
+-- When each log was ingested and scored, the moments its new_log and
+-- new_anomaly notifications are sent. WebSocket resumes whose gap is older
+-- than the API's replay buffer read missed events by these columns rather
+-- than by the logs' own timestamps, which can be far from when they were
+-- announced. Added without a volatile default so existing rows are not
+-- rewritten; they stay NULL and are never replayed.
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMPTZ;
+ALTER TABLE logs ALTER COLUMN ingested_at SET DEFAULT clock_timestamp();
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS scored_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_logs_ingested_at ON logs(ingested_at);
+CREATE INDEX IF NOT EXISTS idx_logs_scored_anomalies ON logs(scored_at) WHERE is_anomaly;
@@ -126,7 +126,7 @@ async function processLog(log) {
     const query = `
       INSERT INTO logs(id, ts, host, app, severity, msg)
       VALUES($1, $2, $3, $4, $5, $6)
-      RETURNING *
+      RETURNING id, ts, host, app, severity, msg, is_anomaly, anomaly_score
     `;
     const values = [log.id, log.ts, log.host, log.app, log.severity, log.msg];
     
@@ -174,18 +174,20 @@ async function checkAlerts(log) {
         `, [alert.id]);
         
         // Insert into alert history
-        await pool.query(`
+        const historyResult = await pool.query(`
           INSERT INTO alert_history(alert_id, log_ids)
           VALUES($1, $2)
+          RETURNING triggered_at
         `, [alert.id, [log.id]]);
         
-        // Notify clients about the triggered alert
+        // Notify clients about the triggered alert, with the stored trigger
+        // time so replays from alert_history match the live event
         const alertNotification = {
           alert_id: alert.id,
           alert_name: alert.name,
           severity: alert.severity,
           log_id: log.id,
-          triggered_at: new Date().toISOString()
+          triggered_at: historyResult.rows[0].triggered_at.toISOString()
         };
         
         await pool.query(`SELECT pg_notify('new_alert', $1)`, [JSON.stringify(alertNotification)]);
@@ -2,7 +2,7 @@
 import { useState } from "react";
 import { Button } from "@/components/ui/button";
 import { useMutation } from "@tanstack/react-query";
-import { fetchApi, SearchLogsParams } from "@/lib/api";
+import { searchLogs, SearchLogsParams } from "@/lib/api";
 import { toast } from "sonner";
 import SearchForm from "@/components/search/SearchForm";
 import SearchResults, { LogEntry } from "@/components/search/SearchResults";
@@ -14,20 +14,24 @@ interface SearchLogsProps {
 
 const SearchLogs = ({ role }: SearchLogsProps) => {
   const [searchResults, setSearchResults] = useState<LogEntry[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [currentSearchParams, setCurrentSearchParams] = useState<SearchLogsParams | undefined>(undefined);
   
   const searchMutation = useMutation({
-    mutationFn: async (params: SearchLogsParams) => {
-      return fetchApi<LogEntry[]>("/logs/search", {
-        method: "POST",
-        body: params,
-      });
+    mutationFn: async ({ params, cursor }: { params: SearchLogsParams; cursor?: string | null }) => {
+      return searchLogs<LogEntry>(params, cursor);
     },
-    onSuccess: (data) => {
-      setSearchResults(data);
-      toast.success(`Search completed`, {
-        description: `Found ${data.length} results`
-      });
+    onSuccess: (data, { cursor }) => {
+      // A cursor means the next page of the same search, appended below the current one
+      setSearchResults((previous) => (cursor ? [...previous, ...data.logs] : data.logs));
+      setNextCursor(data.next_cursor);
+      if (!cursor) {
+        toast.success(`Search completed`, {
+          description: data.next_cursor
+            ? `Showing the first ${data.logs.length} results`
+            : `Found ${data.logs.length} results`
+        });
+      }
     },
     onError: (error) => {
       console.error("Search failed:", error);
@@ -35,6 +39,7 @@ const SearchLogs = ({ role }: SearchLogsProps) => {
         description: error instanceof Error ? error.message : "An unknown error occurred"
       });
       setSearchResults([]);
+      setNextCursor(null);
     }
   });
   
@@ -55,11 +60,18 @@ const SearchLogs = ({ role }: SearchLogsProps) => {
         anomaly_score: i % 7 === 0 ? Math.random() : undefined
       }));
       setSearchResults(mockResults);
+      setNextCursor(null);
       return;
     }
     
     // Use React Query for real API call
-    searchMutation.mutate(params);
+    searchMutation.mutate({ params });
+  };
+  
+  const handleLoadMore = () => {
+    if (currentSearchParams && nextCursor) {
+      searchMutation.mutate({ params: currentSearchParams, cursor: nextCursor });
+    }
   };
 
   return (
@@ -76,6 +88,14 @@ const SearchLogs = ({ role }: SearchLogsProps) => {
       )}
       
       <SearchResults results={searchResults} />
+      
+      {nextCursor && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={handleLoadMore} disabled={searchMutation.isPending}>
+            {searchMutation.isPending ? "Loading..." : "Load more"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -1,6 +1,6 @@
 
 import { useState, useEffect } from "react";
-import useWebSocket from "./useWebSocket";
+import useWebSocket, { parseFrame } from "./useWebSocket";
 import { Alert } from "@/lib/api";
 
 export interface AlertNotification {
@@ -18,8 +18,10 @@ export const useAlertWebSocket = (maxNotifications: number = 20) => {
   useEffect(() => {
     if (lastMessage) {
       try {
-        const notification = JSON.parse(lastMessage);
-        setNotifications(prev => [notification, ...prev.slice(0, maxNotifications - 1)]);
+        const newNotifications = parseFrame<AlertNotification>(lastMessage).reverse();
+        if (newNotifications.length > 0) {
+          setNotifications(prev => [...newNotifications, ...prev].slice(0, maxNotifications));
+        }
       } catch (error) {
         console.error("Failed to parse alert notification:", error);
       }
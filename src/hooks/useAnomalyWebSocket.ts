@@ -1,6 +1,6 @@
 
 import { useState, useEffect } from "react";
-import useWebSocket from "./useWebSocket";
+import useWebSocket, { parseFrame } from "./useWebSocket";
 import { getRecentAnomalies } from "@/lib/api";
 
 export interface Anomaly {
@@ -37,13 +37,14 @@ export const useAnomalyWebSocket = (maxAnomalies: number = 20) => {
   useEffect(() => {
     if (lastMessage) {
       try {
-        const newAnomaly = JSON.parse(lastMessage);
+        const newAnomalies = parseFrame<Anomaly>(lastMessage).reverse();
         // Check if anomaly already exists to avoid duplicates
         setAnomalies(prev => {
-          if (prev.some(a => a.id === newAnomaly.id)) {
+          const fresh = newAnomalies.filter(n => !prev.some(a => a.id === n.id));
+          if (fresh.length === 0) {
             return prev;
           }
-          return [newAnomaly, ...prev.slice(0, maxAnomalies - 1)];
+          return [...fresh, ...prev].slice(0, maxAnomalies);
         });
       } catch (error) {
         console.error("Failed to parse anomaly message:", error);
@@ -1,6 +1,6 @@
 
 import { useState, useEffect } from "react";
-import useWebSocket from "./useWebSocket";
+import useWebSocket, { parseFrame } from "./useWebSocket";
 
 export interface LogEntry {
   id: string;
@@ -20,8 +20,11 @@ export const useLogWebSocket = (maxLogs: number = 100) => {
   useEffect(() => {
     if (lastMessage) {
       try {
-        const newLog = JSON.parse(lastMessage);
-        setLogs(prev => [newLog, ...prev.slice(0, maxLogs - 1)]);
+        // Frames hold events oldest first; the feed shows newest first
+        const newLogs = parseFrame<LogEntry>(lastMessage).reverse();
+        if (newLogs.length > 0) {
+          setLogs(prev => [...newLogs, ...prev].slice(0, maxLogs));
+        }
       } catch (error) {
         console.error("Failed to parse log message:", error);
       }
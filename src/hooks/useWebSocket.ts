@@ -10,11 +10,16 @@ interface UseWebSocketOptions {
   onError?: (event: Event) => void;
 }
 
+// Event frames start with their sequence number: {"seq":123,"events":[...]}
+const SEQ_PATTERN = /^\{"seq":(\d+)/;
+
 const useWebSocket = (url: string, options: UseWebSocketOptions = {}) => {
   const [isConnected, setIsConnected] = useState(false);
   const [lastMessage, setLastMessage] = useState<string | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectAttemptsRef = useRef(0);
+  // Sequence of the last frame received, used to resume after a reconnect
+  const lastSeqRef = useRef<string | null>(null);
   const maxReconnectAttempts = options.reconnectAttempts || 10;
   const reconnectInterval = options.reconnectInterval || 3000;
 
@@ -92,9 +97,12 @@ const useWebSocket = (url: string, options: UseWebSocketOptions = {}) => {
 
     try {
       // Use API_URL from environment or default to current host
-      const wsUrl = url.startsWith("ws") 
+      const baseUrl = url.startsWith("ws") 
         ? url 
         : `${API_URL.replace(/^http/, 'ws')}${url}`;
+      const wsUrl = lastSeqRef.current
+        ? `${baseUrl}${baseUrl.includes("?") ? "&" : "?"}since=${lastSeqRef.current}`
+        : baseUrl;
       
       console.log(`[WebSocket] Connecting to ${wsUrl}`);
       const ws = new WebSocket(wsUrl);
@@ -107,6 +115,10 @@ const useWebSocket = (url: string, options: UseWebSocketOptions = {}) => {
       };
       
       ws.onmessage = (event) => {
+        const seq = SEQ_PATTERN.exec(event.data);
+        if (seq) {
+          lastSeqRef.current = seq[1];
+        }
         setLastMessage(event.data);
       };
       
@@ -176,4 +188,23 @@ const useWebSocket = (url: string, options: UseWebSocketOptions = {}) => {
   };
 };
 
+// The API batches events into {"seq", "events"} frames and also sends
+// control messages ({"type": ...}); return just the events carried by a frame.
+export const parseFrame = <T,>(message: string): T[] => {
+  const data = JSON.parse(message);
+  if (Array.isArray(data)) {
+    return data as T[];
+  }
+  if (data && typeof data === "object" && Array.isArray(data.events)) {
+    return data.events as T[];
+  }
+  if (data && typeof data === "object" && "type" in data) {
+    if (data.type === "error" || data.type === "lagging") {
+      console.warn("[WebSocket] Server notice:", data);
+    }
+    return [];
+  }
+  return [data as T];
+};
+
 export default useWebSocket;
@@ -27,6 +27,8 @@ export type {
   ApiOptions,
   LoginResponse,
   SearchLogsParams,
+  SearchLogsPage,
+  SearchTotal,
   Alert,
   NewAlert,
   AIQuery,
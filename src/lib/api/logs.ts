@@ -1,14 +1,15 @@
 
 import { fetchApi } from "./core";
-import { SearchLogsParams } from "./types";
+import { SearchLogsPage, SearchLogsParams } from "./types";
 import { API_URL } from "./core";
 
 export const getLogStats = async () => {
   return fetchApi("/logs/stats");
 };
 
-export const searchLogs = async (params: SearchLogsParams) => {
-  return fetchApi("/logs/search", {
+export const searchLogs = async <T = Record<string, unknown>>(params: SearchLogsParams, cursor?: string | null) => {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+  return fetchApi<SearchLogsPage<T>>(`/logs/search${query}`, {
     method: "POST",
     body: params,
   });
@@ -22,6 +22,23 @@ export interface SearchLogsParams {
   severity?: string;
   message?: string;
   use_regex?: boolean;
+  full_text?: boolean;
+}
+
+// Match count of a search; error is the +/- margin when the count is an estimate
+export interface SearchTotal {
+  count: number;
+  exact: boolean;
+  method: "exact" | "planner" | "sample" | "chunk_statistics" | "column_statistics" | "rollup";
+  error: number;
+}
+
+// One page of /logs/search results; pass next_cursor back to get the next page
+export interface SearchLogsPage<T = Record<string, unknown>> {
+  logs: T[];
+  next_cursor: string | null;
+  page_size: number;
+  total?: SearchTotal | null;
 }
 
 // Alert types
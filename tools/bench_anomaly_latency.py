@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Ingest-to-anomaly-notification latency of a running LogForge stack.
+
+Inserts logs at a fixed rate the way the ingest service does, with an
+INSERT followed by a new_log notification. A fraction of the logs are
+crafted to score as anomalies. The benchmark listens on new_anomaly and
+reports how long each of those took from insert to notification. Run it
+against an API started with ANOMALY_DETECTOR_MODE=poll and then =notify to
+compare the two paths.
+
+Usage (from the repository root, with api/requirements.txt installed and
+the DB_* variables pointing at the stack's database):
+    python tools/bench_anomaly_latency.py --rate 10000 --seconds 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import asyncpg
+
+HOSTS = [f"bench-{n}" for n in range(8)]
+NORMAL = "GET /api/v1/users/{n} 200 {n}ms"
+ANOMALOUS = "Unhandled exception in handler /orders/{n}: deadlock detected"
+
+async def connect():
+    return await asyncpg.connect(
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=int(os.environ.get("DB_PORT", "5432")),
+        user=os.environ.get("DB_USER", "logforge"),
+        password=os.environ.get("DB_PASSWORD"),
+        database=os.environ.get("DB_NAME", "logforge_db"),
+    )
+
+def make_log(n: int, anomalous: bool) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "host": HOSTS[n % len(HOSTS)],
+        "app": "bench",
+        "severity": "error" if anomalous else "info",
+        "msg": (ANOMALOUS if anomalous else NORMAL).replace("{n}", str(n)),
+    }
+
+async def produce(conn, rate: int, seconds: float, every: int, sent: dict):
+    """Insert logs in batches of one tick's worth, notifying each like ingest does"""
+    tick = 0.01
+    per_tick = max(1, int(rate * tick))
+    n = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        logs = [make_log(n + i, (n + i) % every == 0) for i in range(per_tick)]
+        n += per_tick
+        await conn.execute(
+            """
+            INSERT INTO logs (id, ts, host, app, severity, msg)
+            SELECT u.id, u.ts, u.host, u.app, u.severity, u.msg
+            FROM unnest($1::uuid[], $2::timestamptz[], $3::text[], $4::text[], $5::text[], $6::text[])
+                AS u(id, ts, host, app, severity, msg)
+            """,
+            [uuid.UUID(log["id"]) for log in logs],
+            [datetime.fromisoformat(log["ts"]) for log in logs],
+            [log["host"] for log in logs],
+            [log["app"] for log in logs],
+            [log["severity"] for log in logs],
+            [log["msg"] for log in logs],
+        )
+        await conn.execute(
+            "SELECT pg_notify('new_log', payload) FROM unnest($1::text[]) AS payload",
+            [json.dumps(log) for log in logs],
+        )
+        inserted = time.perf_counter()
+        for log in logs:
+            if log["severity"] == "error":
+                sent[log["id"]] = inserted
+        await asyncio.sleep(max(0.0, started + n / rate - time.perf_counter()))
+    return n
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=10000, help="logs inserted per second")
+    parser.add_argument("--seconds", type=float, default=30, help="how long to insert")
+    parser.add_argument("--every", type=int, default=100, help="one in this many logs is anomalous")
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait for late notifications")
+    args = parser.parse_args()
+
+    sent = {}
+    latencies = []
+
+    def on_anomaly(conn, pid, channel, payload):
+        received = time.perf_counter()
+        events = json.loads(payload)
+        for event in events if isinstance(events, list) else [events]:
+            inserted = sent.pop(event.get("id"), None)
+            if inserted is not None:
+                latencies.append(received - inserted)
+
+    listener = await connect()
+    producer = await connect()
+    await listener.add_listener("new_anomaly", on_anomaly)
+    try:
+        total = await produce(producer, args.rate, args.seconds, args.every, sent)
+        deadline = time.perf_counter() + args.drain
+        while sent and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+    finally:
+        await listener.close()
+        await producer.close()
+
+    print(f"logs={total} anomalies={len(latencies)} missing={len(sent)}")
+    if not latencies:
+        sys.exit(1)
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p50 = latencies_ms[len(latencies_ms) // 2]
+    p99 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.99))]
+    print(f"insert to new_anomaly p50={p50:8.1f}ms p99={p99:8.1f}ms max={latencies_ms[-1]:8.1f}ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Anomaly scoring throughput, per-log keyword scans versus batch scoring.
+
+"before" is the original calculate_anomaly_score: a keyword dict rebuilt on
+every call and one substring scan per keyword. "after" is the detector's
+AnomalyScorer, which scores the whole batch with one precompiled matcher
+and NumPy. Both run over the same synthetic messages and must agree.
+
+Usage (from the repository root, with api/requirements.txt installed):
+    python tools/bench_anomaly_scoring.py --logs 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from scoring.anomaly_scoring import AnomalyScorer  # noqa: E402
+
+SEVERITIES = ["emergency", "alert", "critical", "error", "warning", "notice", "info", "debug"]
+SEVERITY_MIX = [1, 1, 2, 8, 15, 10, 55, 8]
+
+MESSAGES = [
+    "GET /api/v1/users/{n} 200 {n}ms",
+    "Connection to db-primary:5432 established in {n}ms",
+    "Worker {n} finished job {n} successfully",
+    "Cache hit ratio {n}% for region eu-west-{n}",
+    "Request timeout after {n}s contacting upstream payments",
+    "Failed login attempt for user admin from 10.0.{n}.{n}",
+    "Unhandled exception in handler /orders/{n}: KeyError",
+    "Connection refused by 10.1.{n}.{n}:6379",
+    "Disk quota exceeded on /var/lib/postgresql ({n}%)",
+    "ERROR: deadlock detected while updating orders row {n}",
+    "Service unavailable, retrying in {n}s",
+    "Permission denied opening /etc/app/secret-{n}.pem",
+    "Kernel: buffer overflow detected in module net_{n}",
+    "Process crashed with signal {n}, core dumped; data may be corrupt",
+]
+
+def legacy_score(log: dict) -> float:
+    score = 0.0
+    if log["severity"] in ["emergency", "alert", "critical"]:
+        score += 0.4
+    elif log["severity"] == "error":
+        score += 0.3
+    elif log["severity"] == "warning":
+        score += 0.1
+    message = log["msg"].lower()
+    keywords = {
+        "error": 0.2, "failed": 0.2, "exception": 0.3, "timeout": 0.25, "critical": 0.3,
+        "crash": 0.35, "unavailable": 0.3, "refused": 0.25, "denied": 0.2, "exceeded": 0.2,
+        "overflow": 0.3, "deadlock": 0.4, "corrupt": 0.4,
+    }
+    for keyword, weight in keywords.items():
+        if keyword in message:
+            score += weight
+    return min(score, 1.0)
+
+def make_logs(count: int, seed: int):
+    rng = random.Random(seed)
+    logs = []
+    for _ in range(count):
+        template = rng.choice(MESSAGES)
+        msg = template.replace("{n}", str(rng.randint(1, 9999)))
+        logs.append({"severity": rng.choices(SEVERITIES, SEVERITY_MIX)[0], "msg": msg})
+    return logs
+
+def best_of(repeat: int, func):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=100000, help="synthetic logs to score")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per implementation, best is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logs = make_logs(args.logs, args.seed)
+    scorer = AnomalyScorer()
+
+    before, expected = best_of(args.repeat, lambda: [legacy_score(log) for log in logs])
+    after, actual = best_of(args.repeat, lambda: scorer.score_logs(logs))
+
+    mismatches = sum(abs(a - b) > 1e-9 for a, b in zip(expected, actual))
+    print(f"logs={args.logs} mismatches={mismatches}")
+    print(f"before  {args.logs / before:12,.0f} logs/s")
+    print(f"after   {args.logs / after:12,.0f} logs/s  ({before / after:.1f}x)")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
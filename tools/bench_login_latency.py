@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Event-loop latency under concurrent logins.
+
+Fires a burst of concurrent bcrypt verifications, the expensive part of
+POST /token, while a ticker task measures how late the event loop wakes it.
+Runs once with bcrypt called inline in the coroutine and once through the
+API's bounded hashing executor. Rejections count logins turned away with a
+503 once the executor queue is full.
+
+Usage (from the repository root, with api/requirements.txt installed):
+    python tools/bench_login_latency.py --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from fastapi import HTTPException  # noqa: E402
+from app import auth  # noqa: E402
+
+TICK = 0.01
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(time.perf_counter() - expected, 0.0))
+
+async def login_inline(password, hashed):
+    return auth.verify_password(password, hashed)
+
+async def login_executor(password, hashed):
+    return await auth.verify_password_async(password, hashed)
+
+async def run(name, login, logins, password, hashed):
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 5)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login(password, hashed) for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+    rejected = sum(isinstance(result, HTTPException) and result.status_code == 503 for result in results)
+    failed = sum(isinstance(result, BaseException) for result in results) - rejected
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{name:<9} logins={logins} elapsed={elapsed:6.2f}s rejected={rejected} failed={failed} "
+        f"loop lag p50={statistics.median(lags_ms):7.1f}ms p99={p99:7.1f}ms max={lags_ms[-1]:7.1f}ms"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50, help="concurrent logins per run")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor of the test hash")
+    args = parser.parse_args()
+
+    password = "benchmark-password"
+    hashed = auth.pwd_context.hash(password, rounds=args.rounds)
+    print(
+        f"bcrypt rounds={args.rounds} workers={auth.HASH_WORKERS} queue={auth.HASH_QUEUE_SIZE}"
+    )
+    await run("inline", login_inline, args.logins, password, hashed)
+    await run("executor", login_executor, args.logins, password, hashed)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Event-loop latency while the anomaly detector scores, per scoring executor.
+
+Scores batches of synthetic logs through the detector's ScoringExecutor
+while a ticker task measures how late the event loop wakes it, the delay
+every search and WebSocket send would see. Runs once per executor kind:
+inline on the loop, on a thread pool and on a process pool. The process
+pool is warmed up first, so its start-up time is not counted.
+
+Usage (from the repository root, with api/requirements.txt installed):
+    python tools/bench_scoring_executor.py --batches 200 --batch-size 1000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from scoring.anomaly_scoring import AnomalyScorer  # noqa: E402
+from app.services.scoring_executor import EXECUTOR_KINDS, PROCESS, ScoringExecutor  # noqa: E402
+from bench_anomaly_scoring import make_logs  # noqa: E402
+
+TICK = 0.01
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(time.perf_counter() - expected, 0.0))
+
+async def run(kind, batches, workers, max_in_flight):
+    executor = ScoringExecutor(AnomalyScorer(), kind=kind, workers=workers, max_in_flight=max_in_flight)
+    executor.start()
+    if kind == PROCESS:
+        await asyncio.gather(*(executor.score_logs(batches[0]) for _ in range(workers)))
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 5)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(executor.score_logs(batch) for batch in batches))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+    executor.stop()
+    logs = sum(len(batch) for batch in batches)
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{kind:<8} {logs / elapsed:10,.0f} logs/s "
+        f"loop lag p50={statistics.median(lags_ms):7.1f}ms p99={p99:7.1f}ms max={lags_ms[-1]:7.1f}ms"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, default=200, help="batches scored per run")
+    parser.add_argument("--batch-size", type=int, default=1000, help="logs per batch")
+    parser.add_argument("--workers", type=int, default=2, help="scoring threads or processes")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="batches submitted at once")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logs = make_logs(args.batches * args.batch_size, args.seed)
+    batches = [logs[start:start + args.batch_size] for start in range(0, len(logs), args.batch_size)]
+    print(f"batches={args.batches} batch_size={args.batch_size} workers={args.workers}")
+    for kind in EXECUTOR_KINDS:
+        await run(kind, batches, args.workers, args.max_in_flight)
+
+if __name__ == "__main__":
+    asyncio.run(main())